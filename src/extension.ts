@@ -189,8 +189,8 @@ class TimelapseRecorder {
             args.push('--record-only-ide');
         }
 
-        const env = { ...process.env, pythonIoEncoding: 'utf-8' };
-        this.pythonProcess = spawn(pythonPath, args, { env });
+        // Frames are encoded while recording, so the codec preference must reach the recorder
+        this.pythonProcess = spawn(pythonPath, args, { env: this.getPythonEnv(config) });
         this.setupProcessHandlers();
     }
 
@@ -253,6 +253,14 @@ class TimelapseRecorder {
         // Update UI to show stopping state
         this.statusBarItem.text = "$(loading) Stopping...";
         
+        // Request a graceful stop through the stop file first: signals terminate
+        // the process immediately on Windows, leaving the streamed video unfinalized
+        try {
+            fs.writeFileSync(path.join(this.currentOutputDir, 'temp', '.stop'), '');
+        } catch (error) {
+            this.log(`Failed to create stop file: ${error}`, 'ERROR');
+        }
+        
         // Store process reference
         const processToKill = this.pythonProcess;
         
@@ -299,7 +307,7 @@ class TimelapseRecorder {
                     }
                 }
             }
-        }, 1000); // Reduced wait time since we're not waiting for file detection
+        }, 5000); // Give the recorder time to detect the stop file and finalize its video
     }
 
     /**
@@ -311,12 +319,8 @@ class TimelapseRecorder {
         if (fs.existsSync(tempDir)) {
             this.log('Cleaning up temporary directory...');
             try {
-                const files = fs.readdirSync(tempDir);
-                for (const file of files) {
-                    const filePath = path.join(tempDir, file);
-                    fs.unlinkSync(filePath);
-                }
-                fs.rmdirSync(tempDir);
+                // Single recursive removal instead of one unlink call per frame file
+                fs.rmSync(tempDir, { recursive: true, force: true });
                 this.log('Temporary directory cleaned up');
             } catch (error) {
                 this.log(`Error cleaning up temporary directory: ${error}`, 'ERROR');
@@ -326,7 +330,7 @@ class TimelapseRecorder {
 
     /**
      * Checks if frames were captured
-     * Returns true if there are any frame files in the temp directory
+     * Returns true if there are any segment videos or fallback frames files in the temp directory
      */
     private hasFrames(outputDir: string): boolean {
         const tempDir = path.join(outputDir, 'temp');
@@ -334,129 +338,74 @@ class TimelapseRecorder {
             return false;
         }
 
+        return this.hasSegments(tempDir);
+    }
+
+    /**
+     * Checks if the recorder streamed frames into segment videos or fallback frames files
+     * Segments can only be finalized by the Python script
+     */
+    private hasSegments(framesDir: string): boolean {
         try {
-            const files = fs.readdirSync(tempDir);
-            return files.some(file => file.startsWith('frame_') && file.endsWith('.jpg'));
+            return fs.readdirSync(framesDir).some(file =>
+                file.startsWith('segment_') || (file.startsWith('frames_') && file.endsWith('.dat')));
         } catch (error) {
-            this.log(`Error checking frames: ${error}`, 'ERROR');
+            this.log(`Error checking segments: ${error}`, 'ERROR');
             return false;
         }
     }
 
     /**
-     * Checks if ffmpeg is available in the system
+     * Environment for Python processes, recording and video creation both honour the codec setting
      */
-    private async checkFfmpeg(): Promise<boolean> {
-        return new Promise((resolve) => {
-            const ffmpeg = spawn('ffmpeg', ['-version']);
-            
-            ffmpeg.on('error', () => {
-                this.log('ffmpeg not found in system PATH', 'ERROR');
-                resolve(false);
-            });
-
-            ffmpeg.on('close', (code) => {
-                resolve(code === 0);
-            });
-        });
+    private getPythonEnv(config: TimelapseConfig): NodeJS.ProcessEnv {
+        return { ...process.env, pythonIoEncoding: 'utf-8', TIMELAPSE_CODEC: config.videoCodec };
     }
 
     /**
-     * Creates video from captured frames using either ffmpeg or Python
+     * Creates video from the recorded segments using Python
      */
     private async createVideo(framesDir: string, outputPath: string, fps: number): Promise<boolean> {
-        // First check if ffmpeg is available
-        const hasFfmpeg = await this.checkFfmpeg();
-        
-        if (hasFfmpeg) {
-            try {
-                this.log('Creating video using ffmpeg...');
-                
-                return new Promise((resolve) => {
-                    const ffmpeg = spawn('ffmpeg', [
-                        '-y',
-                        '-framerate', fps.toString(),
-                        '-i', path.join(framesDir, 'frame_%d.jpg'),
-                        '-c:v', 'libx264',
-                        '-pix_fmt', 'yuv420p',
-                        '-preset', 'medium',
-                        '-crf', '23',
-                        outputPath
-                    ]);
-
-                    ffmpeg.stdout?.on('data', (data) => {
-                        this.log(`ffmpeg output: ${data}`);
-                    });
-
-                    ffmpeg.stderr?.on('data', (data) => {
-                        const message = data.toString();
-                        if (!message.startsWith('frame=')) {
-                            this.log(`ffmpeg: ${message}`);
-                        }
-                    });
+        this.log('Using Python for video creation...');
+        try {
+            const pythonPath = await this.findPythonPath();
+            const scriptPath = path.join(__dirname, 'timelapse.py');
+            
+            return new Promise((resolve) => {
+                const pythonProcess = spawn(pythonPath, [
+                    scriptPath,
+                    'create-video',
+                    '--frames-dir', framesDir,
+                    '--output-path', outputPath,
+                    '--fps', fps.toString()
+                ], { env: this.getPythonEnv(this.getConfiguration()) });
+
+                pythonProcess.stdout?.on('data', (data) => {
+                    this.log(`Python video creation: ${data}`);
+                });
 
-                    ffmpeg.on('close', (code) => {
-                        if (code === 0) {
-                            this.log('Video created successfully using ffmpeg');
-                            resolve(true);
-                        } else {
-                            this.log(`ffmpeg exited with code ${code}`, 'ERROR');
-                            resolve(false);
-                        }
-                    });
+                pythonProcess.stderr?.on('data', (data) => {
+                    this.log(`Python video creation error: ${data}`, 'ERROR');
+                });
 
-                    ffmpeg.on('error', (err) => {
-                        this.log(`ffmpeg error: ${err}`, 'ERROR');
+                pythonProcess.on('close', (code) => {
+                    if (code === 0) {
+                        this.log('Video created successfully using Python');
+                        resolve(true);
+                    } else {
+                        this.log(`Python video creation failed with code ${code}`, 'ERROR');
                         resolve(false);
-                    });
+                    }
                 });
-            } catch (error) {
-                this.log(`Error creating video with ffmpeg: ${error}`, 'ERROR');
-                return false;
-            }
-        } else {
-            // Fallback to Python for video creation
-            this.log('Falling back to Python for video creation...');
-            try {
-                const pythonPath = await this.findPythonPath();
-                const scriptPath = path.join(__dirname, 'timelapse.py');
-                
-                return new Promise((resolve) => {
-                    const pythonProcess = spawn(pythonPath, [
-                        scriptPath,
-                        'create-video',
-                        '--frames-dir', framesDir,
-                        '--output-path', outputPath,
-                        '--fps', fps.toString()
-                    ]);
-
-                    pythonProcess.stdout?.on('data', (data) => {
-                        this.log(`Python video creation: ${data}`);
-                    });
 
-                    pythonProcess.stderr?.on('data', (data) => {
-                        this.log(`Python video creation error: ${data}`, 'ERROR');
-                    });
-
-                    pythonProcess.on('close', (code) => {
-                        if (code === 0) {
-                            this.log('Video created successfully using Python');
-                            resolve(true);
-                        } else {
-                            this.log(`Python video creation failed with code ${code}`, 'ERROR');
-                            resolve(false);
-                        }
-                    });
-
-                    pythonProcess.on('error', (err) => {
-                        this.log(`Python video creation error: ${err}`, 'ERROR');
-                        resolve(false);
-                    });
+                pythonProcess.on('error', (err) => {
+                    this.log(`Python video creation error: ${err}`, 'ERROR');
+                    resolve(false);
                 });
-            } catch (error) {
-                this.log(`Error creating video with Python: ${error}`, 'ERROR');
-                return false;
-            }
+            });
+        } catch (error) {
+            this.log(`Error creating video with Python: ${error}`, 'ERROR');
+            return false;
         }
     }
 
@@ -769,7 +718,7 @@ class TimelapseRecorder {
             frameInterval,
             frameRate: config.get<number>('frameRate'),  // Deprecated
             videoFps: config.get<number>('videoFps', 10),
-            quality: config.get<number>('quality', 95),
+            quality: config.get<number>('quality', 85),
             videoCodec: config.get<string>('videoCodec', 'H264'),  // Get codec from settings
             captureArea: config.get('captureArea'),
             multiMonitor: config.get<boolean>('multiMonitor', false),
@@ -1,5 +1,5 @@
 # Main timelapse recording script that captures screen and creates video
-# Uses mss for fast screen capture and OpenCV for video creation
+# Uses mss (or dxcam on Windows) for fast screen capture and OpenCV for video creation
 
 import sys
 import os
@@ -9,47 +9,165 @@ import signal
 import atexit
 import platform
 import argparse
+import queue
+import shutil
+import threading
+import traceback
+import subprocess
+import tempfile
+import zlib
+import struct
+from fractions import Fraction
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from datetime import datetime
-import mss
 import cv2
 import numpy as np
 
+# Optional libjpeg-turbo bindings, used for fallback JPEG frames when available
+try:
+    from turbojpeg import TurboJPEG, TJPF_BGRA, TJSAMP_420
+except ImportError:
+    TurboJPEG = None
+
+# Optional libjpeg-turbo wheel with BGR(X) colorspace support, encodes and decodes without channel shuffles
+try:
+    import simplejpeg
+except ImportError:
+    simplejpeg = None
+
+# Optional libav bindings, used to encode with libx264/libx265 in-process
+try:
+    import av
+except ImportError:
+    av = None
+
+# Optional fast non-cryptographic hash, used to detect unchanged frames
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# Optional file system event watcher (inotify, ReadDirectoryChangesW, FSEvents) for control files
+try:
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+
+# Resolved once at import, window tracking and encoder setup check it repeatedly
+PLATFORM = platform.system()
+IS_WINDOWS = PLATFORM == 'Windows'
+IS_MACOS = PLATFORM == 'Darwin'
+
 # Import window handling libraries based on platform
-if platform.system() == 'Windows':
+if IS_WINDOWS:
     import win32gui
     import win32con
     import win32api
-elif platform.system() == 'Darwin':
+    # Optional Desktop Duplication capture, much faster than mss' GDI BitBlt.
+    # bettercam is a maintained dxcam fork with the same API
+    try:
+        import dxcam
+    except ImportError:
+        try:
+            import bettercam as dxcam
+        except ImportError:
+            dxcam = None
+elif IS_MACOS:
     from AppKit import NSWorkspace
 else:
     import Xlib.display
     import Xlib.X
 
-# Add debug logging for MacOS
-IS_MACOS = platform.system() == 'Darwin'
-def debug_log(message):
-    print(f"DEBUG:{message}")
-
 def force_print(message):
     """Print message and flush stdout immediately"""
     print(message)
     sys.stdout.flush()
 
+# Last print time and suppressed count per throttled message key
+_throttled_messages = {}
+
+def throttled_print(key, message, interval=5.0):
+    """
+    Print a message that may repeat every frame at most once per interval seconds.
+    Returns True if it was printed, so callers can add details only then.
+    """
+    now = time.monotonic()
+    last_time, suppressed = _throttled_messages.get(key, (float('-inf'), 0))
+    if now - last_time < interval:
+        _throttled_messages[key] = (last_time, suppressed + 1)
+        return False
+    if suppressed:
+        message += f" (repeated {suppressed} more times)"
+    _throttled_messages[key] = (now, 0)
+    force_print(message)
+    return True
+
+# Window tracking runs every few hundred ms, its details are only printed with TIMELAPSE_DEBUG=1
+if os.environ.get('TIMELAPSE_DEBUG') == '1':
+    def debug_log(message):
+        force_print(f"DEBUG:{message}")
+else:
+    def debug_log(message):
+        pass
+
+# Window title fragment that identifies a VS Code window. It also matches
+# 'Visual Studio Code' and 'VS Code', so one substring test covers all of them
+IDE_TITLE_MARKER = 'Code'
+
+def is_ide_title(title):
+    """Check whether a window title belongs to VS Code"""
+    return IDE_TITLE_MARKER in title
+
+# Last VS Code window found on Windows, revalidated before falling back to EnumWindows
+_ide_hwnd = None
+# Client area computed for (hwnd, rect, show state), reused while none of them change
+_ide_window = (None, None)
+
+# DPI of the tracked window as (hwnd, dpi, lookup time), it only changes when the window moves between monitors
+_window_dpi = (None, 96, float('-inf'))
+DPI_REFRESH_INTERVAL = 60.0
+_user32 = None
+
+def get_window_dpi(hwnd):
+    """DPI of a window, looked up again only for a different window or once a minute"""
+    global _window_dpi, _user32
+    cached_hwnd, dpi, looked_up = _window_dpi
+    now = time.monotonic()
+    if hwnd == cached_hwnd and now - looked_up < DPI_REFRESH_INTERVAL:
+        return dpi
+    if _user32 is None:
+        import ctypes
+        user32 = ctypes.windll.user32
+        user32.SetProcessDPIAware()
+        _user32 = user32
+    dpi = _user32.GetDpiForWindow(hwnd) if hasattr(_user32, 'GetDpiForWindow') else 96
+    _window_dpi = (hwnd, dpi, now)
+    return dpi
+
 def get_ide_window():
     """Get the IDE window coordinates based on the platform"""
-    if platform.system() == 'Windows':
+    global _ide_hwnd, _ide_window
+    if IS_WINDOWS:
         try:
             # Try to get the foreground window first
             hwnd = win32gui.GetForegroundWindow()
             title = win32gui.GetWindowText(hwnd)
-            force_print(f"DEBUG:Active window: '{title}'")
+            debug_log(f"Active window: '{title}'")
             
-            # If the active window is not VS Code, enumerate all windows
-            if not any(ide_name in title for ide_name in ['Visual Studio Code', 'VS Code', 'Code']):
+            # If the active window is not VS Code, reuse the window found last time while it's still valid
+            if not is_ide_title(title):
+                hwnd = _ide_hwnd
+                title = ''
+                if hwnd and win32gui.IsWindow(hwnd) and win32gui.IsWindowVisible(hwnd):
+                    title = win32gui.GetWindowText(hwnd)
+
+            # Otherwise enumerate all windows
+            if not is_ide_title(title):
                 def callback(hwnd, windows):
                     if win32gui.IsWindowVisible(hwnd):
                         title = win32gui.GetWindowText(hwnd)
-                        if any(ide_name in title for ide_name in ['Visual Studio Code', 'VS Code', 'Code']):
+                        if is_ide_title(title):
                             windows.append(hwnd)
                     return True
 
@@ -57,18 +175,20 @@ def get_ide_window():
                 win32gui.EnumWindows(callback, windows)
                 
                 if not windows:
+                    _ide_hwnd = None
                     force_print("WARNING:No VS Code window found")
                     return None
                     
-                force_print(f"DEBUG:Found {len(windows)} VS Code windows")
+                debug_log(f"Found {len(windows)} VS Code windows")
                 hwnd = windows[0]
                 title = win32gui.GetWindowText(hwnd)
             
-            force_print(f"DEBUG:Using window: '{title}'")
+            _ide_hwnd = hwnd
+            debug_log(f"Using window: '{title}'")
             
             # Get window placement info
             placement = win32gui.GetWindowPlacement(hwnd)
-            force_print(f"DEBUG:Window placement: {placement}")
+            debug_log(f"Window placement: {placement}")
             
             # Check if window is minimized
             if placement[1] == win32con.SW_SHOWMINIMIZED:
@@ -78,7 +198,12 @@ def get_ide_window():
             
             # Get window coordinates
             rect = win32gui.GetWindowRect(hwnd)
-            force_print(f"DEBUG:Window rect: {rect}")
+            debug_log(f"Window rect: {rect}")
+
+            # Same window, position and show state as last time: the client area can't have changed
+            window_key = (hwnd, rect, placement[1])
+            if window_key == _ide_window[0]:
+                return _ide_window[1]
             
             # Get window styles
             style = win32gui.GetWindowLong(hwnd, win32con.GWL_STYLE)
@@ -86,16 +211,13 @@ def get_ide_window():
             
             # Check if window is maximized
             is_maximized = style & win32con.WS_MAXIMIZE
-            force_print(f"DEBUG:Window is maximized: {bool(is_maximized)}")
+            debug_log(f"Window is maximized: {bool(is_maximized)}")
             
             # Get DPI for the window
             try:
-                import ctypes
-                user32 = ctypes.windll.user32
-                user32.SetProcessDPIAware()
-                dpi = user32.GetDpiForWindow(hwnd) if hasattr(user32, 'GetDpiForWindow') else 96
+                dpi = get_window_dpi(hwnd)
                 dpi_scale = dpi / 96.0
-                force_print(f"DEBUG:Window DPI: {dpi} (scale: {dpi_scale})")
+                debug_log(f"Window DPI: {dpi} (scale: {dpi_scale})")
             except Exception as e:
                 force_print(f"WARNING:Failed to get DPI, using default: {e}")
                 dpi_scale = 1.0
@@ -118,7 +240,7 @@ def get_ide_window():
                 border_width = int(8 * dpi_scale)  # Windows 10/11 invisible border
                 title_height = int(8 * dpi_scale)  # Top invisible border
             
-            force_print(f"DEBUG:Calculated borders - width: {border_width}, title height: {title_height}")
+            debug_log(f"Calculated borders - width: {border_width}, title height: {title_height}")
             
             # Calculate client area
             x = rect[0] + border_width
@@ -129,7 +251,7 @@ def get_ide_window():
             # Ensure coordinates are within screen bounds
             screen_width = win32api.GetSystemMetrics(win32con.SM_CXSCREEN)
             screen_height = win32api.GetSystemMetrics(win32con.SM_CYSCREEN)
-            force_print(f"DEBUG:Screen dimensions: {screen_width}x{screen_height}")
+            debug_log(f"Screen dimensions: {screen_width}x{screen_height}")
             
             # For maximized windows, adjust coordinates to screen bounds
             if is_maximized:
@@ -149,16 +271,16 @@ def get_ide_window():
                 'width': width,
                 'height': height
             }
-            force_print(f"DEBUG:Final window info: {window_info}")
+            debug_log(f"Final window info: {window_info}")
+            _ide_window = (window_key, window_info)
             return window_info
             
         except Exception as e:
             force_print(f"WARNING:Error getting window coordinates: {e}")
-            import traceback
             force_print(f"DEBUG:Stack trace: {traceback.format_exc()}")
             return None
 
-    elif platform.system() == 'Darwin':
+    elif IS_MACOS:
         workspace = NSWorkspace.sharedWorkspace()
         for window in workspace.runningApplications():
             if 'Code' in window.localizedName():
@@ -192,10 +314,700 @@ def get_ide_window():
                 }
         return None
 
+# Plain range until load_strip_alpha_kernel() imports numba, whose prange splits the rows across threads
+prange = range
+
+def _bgra_to_bgr(src, dst):
+    for y in prange(src.shape[0]):
+        for x in range(src.shape[1]):
+            dst[y, x, 0] = src[y, x, 0]
+            dst[y, x, 1] = src[y, x, 1]
+            dst[y, x, 2] = src[y, x, 2]
+
+_strip_alpha_kernel = None  # None until loaded, then the compiled kernel or False without numba
+
+def load_strip_alpha_kernel():
+    """
+    Compile the BGRA -> BGR kernel with the optional numba JIT.
+    Imported on demand like mss, numba alone adds ~0.4 s to create-video and --help.
+    """
+    global _strip_alpha_kernel, prange
+    if _strip_alpha_kernel is None:
+        try:
+            import numba
+        except ImportError:
+            _strip_alpha_kernel = False
+            return
+        # The TBB layer can hang interpreter exit when kernels ran on a non-main thread,
+        # the encoder thread is the only caller so the built-in workqueue layer is enough
+        if 'NUMBA_THREADING_LAYER' not in os.environ:
+            numba.config.THREADING_LAYER = 'workqueue'
+        prange = numba.prange
+        kernel = numba.njit(parallel=True, cache=True, nogil=True)(_bgra_to_bgr)
+        # Compile now, not on the first frame where it would stall the encoder
+        kernel(np.zeros((2, 2, 4), dtype=np.uint8), np.empty((2, 2, 3), dtype=np.uint8))
+        _strip_alpha_kernel = kernel
+
+def strip_alpha(src, dst):
+    """Copy the BGR channels of a BGRA frame into a preallocated contiguous buffer"""
+    if _strip_alpha_kernel:
+        # Rows are split across threads and the GIL is released
+        _strip_alpha_kernel(src, dst)
+    else:
+        np.copyto(dst, src[:, :, :3])
+
+def frame_digest(frame):
+    """
+    Cheap fingerprint of a frame for spotting unchanged screens.
+    Hashes every pixel in place, a one pixel '.' or cursor move must not count as unchanged.
+    """
+    # A no-op for captured frames, both backends hand out contiguous buffers
+    data = np.ascontiguousarray(frame).data
+    if xxhash is not None:
+        return xxhash.xxh3_64_intdigest(data)
+    return zlib.crc32(data)
+
+def get_codec_options():
+    """Build the list of (codec, extension) pairs to try, preferred codec first"""
+    # Get preferred codec from arguments, with fallbacks
+    preferred_codec = os.environ.get('TIMELAPSE_CODEC', 'H264')
+
+    # Try different codecs in order of preference
+    codecs = []
+
+    # Start with preferred codec
+    if preferred_codec in ['H265', 'AV1', 'H264', 'mp4v', 'XVID', 'MJPG']:
+        if preferred_codec == 'H265':
+            codec_options = [
+                ('hevc', '.mp4'),
+                ('hvc1', '.mp4'),
+                ('x265', '.mp4')
+            ]
+        elif preferred_codec == 'AV1':
+            codec_options = [
+                ('av01', '.mp4'),
+                ('aom0', '.mp4')
+            ]
+        else:
+            ext = '.mp4' if preferred_codec in ['H264', 'mp4v'] else '.avi'
+            codec_options = [(preferred_codec, ext)]
+
+        codecs.extend(codec_options)
+
+    # Add fallback codecs
+    fallback_codecs = [
+        ('H264', '.mp4'),
+        ('mp4v', '.mp4'),
+        ('XVID', '.avi'),
+        ('MJPG', '.avi')
+    ]
+
+    for codec, ext in fallback_codecs:
+        if codec != preferred_codec:
+            codecs.append((codec, ext))
+
+    return codecs
+
+# The encoder that worked and those that can't work here are remembered across runs,
+# so each recording and create-video call starts with the right one instead of probing them all
+PROBE_CACHE_TTL = 7 * 24 * 3600  # Re-probe weekly in case drivers or GPUs changed
+
+# Error text meaning an encoder can't work on this machine (no driver, library or device).
+# Other failures, like a busy GPU or an exhausted session limit, may pass next time and aren't cached
+UNSUPPORTED_ENCODER_ERRORS = ('unknown encoder', 'encoder not found', 'cannot load', 'no capable devices',
+                              'no device available', 'not supported', 'failed to initialise', 'no usable')
+
+def is_unsupported_error(message):
+    """Whether an encoder's error output means it is unusable here rather than failing for now"""
+    message = message.lower()
+    return any(marker in message for marker in UNSUPPORTED_ENCODER_ERRORS)
+
+_probe_cache = None
+
+def probe_cache_path():
+    """Location of the persistent encoder probe cache"""
+    if IS_WINDOWS:
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'timelapse', 'codec.json')
+
+def load_probe_cache():
+    """Load the probe cache once per process, an unreadable cache is treated as empty"""
+    global _probe_cache
+    if _probe_cache is None:
+        try:
+            with open(probe_cache_path(), 'r', encoding='utf-8') as f:
+                _probe_cache = json.load(f)
+            if not isinstance(_probe_cache, dict):
+                _probe_cache = {}
+        except (OSError, ValueError):
+            _probe_cache = {}
+    return _probe_cache
+
+def probe_cache_entry(scope):
+    """
+    The live entry of scope, a string identifying the encoding library and its
+    version so upgrading it invalidates the entry. Empty once expired.
+    """
+    entry = load_probe_cache().get(scope)
+    if not isinstance(entry, dict) or time.time() - entry.get('time', 0) > PROBE_CACHE_TTL:
+        return {}
+    return entry
+
+def failed_encoders(scope):
+    """Names that can't work within scope"""
+    return set(probe_cache_entry(scope).get('failed', []))
+
+def preferred_first(scope, candidates, name=lambda candidate: candidate):
+    """Candidates with the one that last worked within scope moved to the front"""
+    working = probe_cache_entry(scope).get('working')
+    return sorted(candidates, key=lambda candidate: name(candidate) != working)
+
+def record_failed_encoder(scope, name):
+    """Remember that an encoder can't work here"""
+    failed = failed_encoders(scope)
+    if name not in failed:
+        update_probe_cache(scope, failed=sorted(failed | {name}))
+
+def record_working_encoder(scope, name):
+    """Remember the encoder that passed its probe, so the next run tries it first"""
+    if probe_cache_entry(scope).get('working') != name:
+        update_probe_cache(scope, working=name, failed=sorted(failed_encoders(scope) - {name}))
+
+def update_probe_cache(scope, **fields):
+    """Store fields in the entry of scope, the cache is best effort"""
+    cache = load_probe_cache()
+    # Keep the probe time of a live entry so the whole scope still expires together
+    entry = probe_cache_entry(scope) or {'time': time.time()}
+    entry.update(fields)
+    cache[scope] = entry
+    path = probe_cache_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Recorder and create-video runs may write concurrently, so replace the file atomically
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f)
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"INFO:Failed to update encoder probe cache: {str(e)}")
+
+# Hardware encoders per codec family, in order of preference for each platform
+HARDWARE_ENCODERS = {
+    'Windows': {'H264': ['h264_nvenc', 'h264_qsv', 'h264_amf'], 'H265': ['hevc_nvenc', 'hevc_qsv', 'hevc_amf']},
+    'Darwin': {'H264': ['h264_videotoolbox'], 'H265': ['hevc_videotoolbox']},
+    'Linux': {'H264': ['h264_nvenc', 'h264_qsv', 'h264_vaapi'], 'H265': ['hevc_nvenc', 'hevc_qsv', 'hevc_vaapi']},
+}
+
+# DRM render node the VAAPI encoders (AMD/Intel on Linux) upload frames to
+VAAPI_DEVICE = '/dev/dri/renderD128'
+
+def hardware_encoder_candidates():
+    """Hardware encoders to try for the preferred codec, or just the encoder named by TIMELAPSE_ENCODER"""
+    forced = os.environ.get('TIMELAPSE_ENCODER')
+    if forced:
+        return [forced]
+    preferred_codec = os.environ.get('TIMELAPSE_CODEC', 'H264')
+    return HARDWARE_ENCODERS.get(PLATFORM, {}).get(preferred_codec, [])
+
+# Encoder specific options passed to ffmpeg, keyed by the encoder name's suffix.
+# Timelapses are low-motion, so B-frames cost encode time for little gain
+FFMPEG_ENCODER_ARGS = {
+    'nvenc': ['-preset', 'p4', '-tune', 'hq', '-rc', 'vbr', '-cq', '23', '-bf', '0'],
+    'qsv': ['-preset', 'medium'],
+    'amf': ['-quality', 'balanced'],
+    'vaapi': [],
+    'videotoolbox': [],
+    'libx264': ['-preset', 'veryfast', '-tune', 'stillimage', '-crf', '20', '-bf', '0'],
+    'libx265': ['-preset', 'veryfast', '-crf', '22', '-bf', '0'],
+}
+
+# Seconds between keyframes, long GOPs suit mostly static screen content
+KEYFRAME_INTERVAL = 10
+
+def keyframe_distance(fps):
+    return max(1, int(fps * KEYFRAME_INTERVAL))
+
+# yuv420p needs even dimensions, window captures often aren't
+EVEN_PAD_FILTER = 'pad=ceil(iw/2)*2:ceil(ih/2)*2'
+
+def ffmpeg_encode_args(encoder, fps=None):
+    """ffmpeg output arguments encoding with encoder: filter chain, codec options and pixel format"""
+    family = encoder.split('_')[-1]
+    gop = ['-g', str(keyframe_distance(fps))] if fps else []
+    if family == 'vaapi':
+        # VAAPI encodes GPU surfaces, the frames are converted to nv12 and uploaded first
+        return ['-vaapi_device', VAAPI_DEVICE, '-vf', f'{EVEN_PAD_FILTER},format=nv12,hwupload',
+                '-c:v', encoder, *FFMPEG_ENCODER_ARGS[family], *gop]
+    return ['-vf', EVEN_PAD_FILTER, '-c:v', encoder, *FFMPEG_ENCODER_ARGS.get(family, []), *gop,
+            '-pix_fmt', 'yuv420p']
+
+# Software encoders per codec family, used through PyAV or the ffmpeg CLI
+SOFTWARE_ENCODERS = {'H264': 'libx264', 'H265': 'libx265'}
+
+_ffmpeg_encoders = False  # False until listed, then `ffmpeg -encoders` output or None
+
+def list_ffmpeg_encoders(ffmpeg_path):
+    """Returns the encoder listing of the ffmpeg CLI, None if it couldn't be listed"""
+    global _ffmpeg_encoders
+    if _ffmpeg_encoders is False:
+        _ffmpeg_encoders = None
+        try:
+            result = subprocess.run([ffmpeg_path, '-hide_banner', '-encoders'],
+                                    capture_output=True, text=True, timeout=10)
+            if result.returncode == 0:
+                _ffmpeg_encoders = result.stdout
+            else:
+                print(f"INFO:Failed to list ffmpeg encoders: exit code {result.returncode}")
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"INFO:Failed to list ffmpeg encoders: {str(e)}")
+    return _ffmpeg_encoders
+
+_hardware_encoder = False  # False until probed, then encoder name or None
+
+def find_hardware_encoder():
+    """
+    Probe ffmpeg once for a working hardware encoder matching the preferred codec.
+    Listing in `ffmpeg -encoders` only means support was compiled in,
+    so each candidate is confirmed with a one-frame test encode.
+    """
+    global _hardware_encoder
+    if _hardware_encoder is not False:
+        return _hardware_encoder
+
+    _hardware_encoder = None
+    ffmpeg_path = shutil.which('ffmpeg')
+    candidates = [encoder for encoder in hardware_encoder_candidates()
+                  if not encoder.endswith('_vaapi') or os.path.exists(VAAPI_DEVICE)]
+    if not ffmpeg_path or not candidates:
+        return None
+
+    try:
+        scope = f"ffmpeg {ffmpeg_path} {int(os.path.getmtime(ffmpeg_path))}"
+    except OSError as e:
+        print(f"INFO:Hardware encoder probe failed: {str(e)}")
+        return None
+    skipped = failed_encoders(scope)
+    candidates = preferred_first(scope, [encoder for encoder in candidates if encoder not in skipped])
+    if not candidates:
+        return None
+    listed = list_ffmpeg_encoders(ffmpeg_path)
+    for encoder in candidates:
+        # Without a listing the probe encode alone decides, a failed listing proves nothing
+        if listed is not None and encoder not in listed:
+            # Not compiled into this ffmpeg build, that won't change until the binary does
+            record_failed_encoder(scope, encoder)
+            continue
+        try:
+            test = subprocess.run(
+                [ffmpeg_path, '-hide_banner', '-loglevel', 'error', '-f', 'lavfi',
+                 '-i', 'color=black:s=256x256', '-frames:v', '1', *ffmpeg_encode_args(encoder), '-f', 'null', '-'],
+                capture_output=True, text=True, errors='replace', timeout=10
+            )
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"INFO:Probe of {encoder} failed: {str(e)}")
+            continue
+        if test.returncode == 0:
+            print(f"INFO:Using ffmpeg encoder {encoder}")
+            _hardware_encoder = encoder
+            record_working_encoder(scope, encoder)
+            break
+        # One line, the extension reads stdout line by line by prefix
+        print(f"INFO:Probe of {encoder} failed: {' '.join(test.stderr.split())}")
+        if is_unsupported_error(test.stderr):
+            record_failed_encoder(scope, encoder)
+
+    return _hardware_encoder
+
+def find_ffmpeg_software_encoder():
+    """x264/x265 for the preferred codec when the ffmpeg CLI has it compiled in, otherwise None"""
+    ffmpeg_path = shutil.which('ffmpeg')
+    encoder = SOFTWARE_ENCODERS.get(os.environ.get('TIMELAPSE_CODEC', 'H264'))
+    if not ffmpeg_path or not encoder or encoder not in (list_ffmpeg_encoders(ffmpeg_path) or ''):
+        return None
+    return encoder
+
+class FfmpegWriter:
+    """
+    Minimal cv2.VideoWriter-compatible writer that pipes raw BGR (or BGRA) frames into an ffmpeg process.
+    Used for hardware encoders, which OpenCV's VideoWriter can't select, and for x264/x265
+    when PyAV is missing, since OpenCV's writer exposes no presets and often lacks H.264.
+    If ffmpeg exits early the writer closes itself, isOpened() turns False and the
+    caller can switch to another backend.
+    """
+    def __init__(self, output_path, fps, width, height, encoder, pix_fmt='bgr24'):
+        self.bgra = pix_fmt == 'bgra'
+        self.failed = False
+        command = [
+            shutil.which('ffmpeg'), '-y', '-loglevel', 'error',
+            '-f', 'rawvideo', '-pix_fmt', pix_fmt, '-s', f'{width}x{height}', '-r', str(fps), '-i', '-',
+            *ffmpeg_encode_args(encoder, fps), output_path
+        ]
+        creationflags = getattr(subprocess, 'CREATE_NO_WINDOW', 0) if IS_WINDOWS else 0
+        # stderr goes to a file, a pipe nobody reads while we feed stdin could fill up and stall ffmpeg
+        self.stderr = tempfile.TemporaryFile()
+        try:
+            self.proc = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                         stderr=self.stderr, creationflags=creationflags)
+        except OSError as e:
+            print(f"INFO:Failed to start ffmpeg: {str(e)}")
+            self.proc = None
+            self.stderr.close()
+
+    def isOpened(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def write(self, frame):
+        if self.proc is None:
+            return
+        try:
+            # A no-op for captured frames and our own buffers, both are contiguous already
+            self.proc.stdin.write(np.ascontiguousarray(frame).data)
+        except OSError:
+            # ffmpeg exited, e.g. an encoder that passed the probe but failed to initialize
+            self.release()
+            self.failed = True
+
+    def release(self):
+        """Close ffmpeg's input and wait for it, reporting its error output if it failed"""
+        if self.proc is None:
+            return
+        try:
+            self.proc.stdin.close()
+        except OSError:
+            pass  # Already exited, the exit code says why
+        if self.proc.wait() != 0:
+            self.failed = True
+            self.stderr.seek(0)
+            # One line, the extension reads stdout line by line by prefix
+            message = ' '.join(self.stderr.read().decode('utf-8', errors='replace').split())
+            print(f"WARNING:ffmpeg exited with code {self.proc.returncode}: {message}")
+        self.stderr.close()
+        self.proc = None
+
+# Encoder options for PyAV, built from FFMPEG_ENCODER_ARGS so output quality doesn't depend on the backend
+PYAV_ENCODER_OPTIONS = {
+    family: {option.lstrip('-'): value for option, value in zip(args[::2], args[1::2])}
+    for family, args in FFMPEG_ENCODER_ARGS.items()
+}
+
+_pyav_encoder = False  # False until probed, then encoder name or None
+
+def find_pyav_encoder():
+    """
+    Pick the PyAV encoder once per process. PyAV bundles its own libav,
+    so hardware encoders work without the ffmpeg CLI; like find_hardware_encoder,
+    each candidate must survive a one-frame test encode, or x264/x265 is used.
+    """
+    global _pyav_encoder
+    if _pyav_encoder is not False:
+        return _pyav_encoder
+
+    preferred_codec = os.environ.get('TIMELAPSE_CODEC', 'H264')
+    _pyav_encoder = SOFTWARE_ENCODERS.get(preferred_codec)
+    scope = f"pyav {av.__version__}"
+    skipped = failed_encoders(scope)
+    for encoder in preferred_first(scope, hardware_encoder_candidates()):
+        # VAAPI needs a hardware frames context, which PyAV doesn't set up
+        if encoder.endswith('_vaapi') or encoder not in av.codecs_available or encoder in skipped:
+            continue
+        # libav logging is off by default, the error text tells unsupported from transient failures
+        log_level = av.logging.get_level()
+        av.logging.set_level(av.logging.ERROR)
+        try:
+            with av.logging.Capture() as logs:
+                context = av.CodecContext.create(encoder, 'w')
+                context.width = context.height = 256
+                context.pix_fmt = 'yuv420p'
+                context.time_base = Fraction(1, 30)
+                context.options = PYAV_ENCODER_OPTIONS.get(encoder.split('_')[-1], {})
+                context.open()
+                test_frame = av.VideoFrame(256, 256, 'yuv420p')
+                test_frame.pts = 0
+                context.encode(test_frame)
+            print(f"INFO:Using PyAV encoder {encoder}")
+            _pyav_encoder = encoder
+            record_working_encoder(scope, encoder)
+            break
+        except Exception as e:
+            message = ' '.join(log[2].strip() for log in logs) or str(e)
+            print(f"INFO:PyAV probe of {encoder} failed: {message.strip()}")
+            if is_unsupported_error(message):
+                record_failed_encoder(scope, encoder)
+        finally:
+            av.logging.set_level(log_level)
+
+    return _pyav_encoder
+
+class PyAVWriter:
+    """
+    Minimal cv2.VideoWriter-compatible writer encoding BGR frames through PyAV.
+    libav releases the GIL while encoding, so x264/x265 frame threading uses all cores,
+    unlike the single-threaded encoder behind OpenCV's VideoWriter, and hardware encoders
+    (NVENC, QSV, ...) can be used without the ffmpeg CLI.
+    Like FfmpegWriter, an encode error closes the writer and isOpened() turns False.
+    """
+    def __init__(self, output_path, fps, width, height, encoder, pix_fmt='bgr24'):
+        self.container = None
+        self.failed = False
+        self.frame_index = 0
+        self.last_frame = None
+        self.pix_fmt = pix_fmt
+        self.bgra = pix_fmt == 'bgra'
+        # yuv420p needs even dimensions, window captures often aren't
+        self.padded = None
+        if width % 2 or height % 2:
+            channels = 4 if self.bgra else 3
+            self.padded = np.zeros((height + height % 2, width + width % 2, channels), dtype=np.uint8)
+        try:
+            self.container = av.open(output_path, mode='w')
+            self.stream = self.container.add_stream(encoder, rate=Fraction(fps).limit_denominator(1001),
+                                                    options=PYAV_ENCODER_OPTIONS.get(encoder.split('_')[-1], {}))
+            self.stream.width = width + width % 2
+            self.stream.height = height + height % 2
+            self.stream.pix_fmt = 'yuv420p'
+            self.stream.codec_context.gop_size = keyframe_distance(fps)
+            self.stream.thread_type = 'AUTO'
+            # libav would only open the codec on the first frame, open it now so bad options fail here
+            self.stream.codec_context.open()
+        except Exception as e:
+            print(f"INFO:Failed to open PyAV encoder {encoder}: {str(e)}")
+            self.release()
+
+    def isOpened(self):
+        return self.container is not None
+
+    def write(self, frame):
+        if self.container is None:
+            return
+        if self.padded is not None:
+            self.padded[:frame.shape[0], :frame.shape[1]] = frame
+            frame = self.padded
+        # Convert to the encoder's pixel format here so repeat_last can reuse the result
+        self.last_frame = av.VideoFrame.from_ndarray(frame, format=self.pix_fmt).reformat(format='yuv420p')
+        self.encode_last()
+
+    def repeat_last(self):
+        """Write the previous frame again without converting its pixels a second time"""
+        if self.container is not None:
+            self.encode_last()
+
+    def encode_last(self):
+        # The encoder keeps its own reference to submitted frames, so the pts can be reused
+        self.last_frame.pts = self.frame_index
+        self.frame_index += 1
+        try:
+            self.container.mux(self.stream.encode(self.last_frame))
+        except Exception as e:
+            print(f"WARNING:PyAV encoding failed: {str(e)}")
+            self.failed = True
+            self.release()
+
+    def release(self):
+        """Flush and close the container, errors only mark the writer failed"""
+        if self.container is None:
+            return
+        try:
+            # Flush frames still buffered in the encoder
+            if self.frame_index and not self.failed:
+                self.container.mux(self.stream.encode(None))
+        except Exception as e:
+            print(f"WARNING:PyAV flush failed: {str(e)}")
+            self.failed = True
+        try:
+            self.container.close()
+        except Exception as e:
+            print(f"WARNING:Failed to close PyAV output: {str(e)}")
+            self.failed = True
+        self.container = None
+
+def video_writer_backends():
+    """
+    Writer backends in order of preference as (kind, encoder) pairs, kind being 'ffmpeg', 'pyav' or 'cv2'.
+    Each family is probed only when the backends before it didn't open, and
+    the OpenCV backend picks its codec itself when the writer is opened.
+    """
+    encoder = find_hardware_encoder()
+    if encoder:
+        yield 'ffmpeg', encoder
+    encoder = find_pyav_encoder() if av is not None else None
+    if encoder:
+        yield 'pyav', encoder
+    encoder = find_ffmpeg_software_encoder()
+    if encoder:
+        yield 'ffmpeg', encoder
+    yield 'cv2', None
+
+def open_video_writer(output_path, fps, width, height, accept_bgra=False, backends=None):
+    """
+    Opens a VideoWriter for the given frame size, preferring an ffmpeg hardware encoder,
+    then a multi-threaded PyAV software encoder, then x264/x265 through the ffmpeg CLI,
+    and otherwise trying OpenCV codecs in order of preference.
+    backends restricts the choice to the given (kind, encoder) pairs; passing a
+    video_writer_backends() iterator and calling again resumes after the backend that was used.
+    With accept_bgra the ffmpeg and PyAV writers take BGRA frames and have bgra set,
+    OpenCV writers always need BGR.
+    Returns (writer, path) where path may differ from output_path in its extension,
+    or (None, None) if no codec could be initialized.
+    """
+    pix_fmt = 'bgra' if accept_bgra else 'bgr24'
+    for kind, encoder in (video_writer_backends() if backends is None else backends):
+        if kind == 'ffmpeg':
+            writer = FfmpegWriter(output_path, fps, width, height, encoder, pix_fmt)
+            if writer.isOpened():
+                print(f"INFO:Successfully initialized ffmpeg writer with encoder {encoder}")
+                return writer, output_path
+            writer.release()
+        elif kind == 'pyav':
+            writer = PyAVWriter(output_path, fps, width, height, encoder, pix_fmt)
+            if writer.isOpened():
+                print(f"INFO:Successfully initialized PyAV writer with encoder {encoder}")
+                return writer, output_path
+        else:
+            writer, path = open_opencv_writer(output_path, fps, width, height)
+            if writer is not None:
+                return writer, path
+    return None, None
+
+def open_opencv_writer(output_path, fps, width, height):
+    """Opens the first OpenCV VideoWriter codec that works, returns (writer, path) or (None, None)"""
+    scope = f"cv2 {cv2.__version__}"
+    skipped = failed_encoders(scope)
+    failed = []
+    # Let OpenCV's FFmpeg backend pick a hardware encoder (D3D11/MFX/VAAPI), it falls back to software on its own
+    hw_params = []
+    if hasattr(cv2, 'VIDEOWRITER_PROP_HW_ACCELERATION'):
+        hw_params = [cv2.VIDEOWRITER_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY]
+
+    for codec, ext in preferred_first(scope, get_codec_options(), name=lambda option: option[0]):
+        if codec in skipped:
+            continue
+        try:
+            fourcc = cv2.VideoWriter_fourcc(*codec)
+            test_path = output_path.replace('.mp4', ext)
+
+            if codec in ['hevc', 'hvc1', 'x265', 'av01', 'aom0']:
+                test_writer = cv2.VideoWriter(test_path, fourcc, fps, (width, height),
+                                            params=[
+                                                cv2.VIDEOWRITER_PROP_QUALITY, 100,
+                                                cv2.VIDEOWRITER_PROP_BITRATE, 8000000,
+                                                *hw_params
+                                            ])
+            elif hw_params:
+                test_writer = cv2.VideoWriter(test_path, fourcc, fps, (width, height), params=hw_params)
+            else:
+                test_writer = cv2.VideoWriter(test_path, fourcc, fps, (width, height))
+
+            if test_writer.isOpened():
+                print(f"INFO:Successfully initialized video writer with codec {codec}")
+                if hw_params and test_writer.get(cv2.VIDEOWRITER_PROP_HW_ACCELERATION) not in (0, -1):
+                    print(f"INFO:OpenCV video writer uses hardware acceleration "
+                          f"{int(test_writer.get(cv2.VIDEOWRITER_PROP_HW_ACCELERATION))}")
+                # Only trust failures once another codec opened the same path,
+                # otherwise the output location itself may have been the problem
+                for failed_codec in failed:
+                    record_failed_encoder(scope, failed_codec)
+                record_working_encoder(scope, codec)
+                return test_writer, test_path
+            else:
+                test_writer.release()
+                failed.append(codec)
+        except Exception as e:
+            print(f"INFO:Codec {codec} failed: {str(e)}")
+            continue
+
+    return None, None
+
+class MssCapturer:
+    """Screen capture through mss, available on every platform"""
+    def __init__(self):
+        # Imported here so create-video and --help don't pay for it
+        import mss
+        self.sct = mss.mss()
+        self.monitors = self.sct.monitors  # monitors[0] spans all screens, monitors[1] is primary
+
+    def grab(self, monitor):
+        """Returns the monitor region as a HxWx4 BGRA array"""
+        screenshot = self.sct.grab(monitor)
+        # View the BGRA pixels mss already holds instead of copying them.
+        # mss allocates a fresh buffer per grab, so the view stays valid while queued
+        return np.frombuffer(screenshot.raw, dtype=np.uint8).reshape(screenshot.height, screenshot.width, 4)
+
+    def close(self):
+        self.sct.close()
+
+class DxcamCapturer:
+    """
+    Windows Desktop Duplication capture through dxcam, primary monitor only.
+    Runs dxcam's own capture thread and hands out the latest frame from its ring buffer.
+    """
+    def __init__(self, frame_rate):
+        self.frame_rate = frame_rate
+        self.camera = dxcam.create(output_color='BGRA')
+        primary = {'left': 0, 'top': 0, 'width': self.camera.width, 'height': self.camera.height}
+        self.monitors = [primary, primary]
+        self.region = None
+
+    def grab(self, monitor):
+        """Returns the monitor region as a HxWx4 BGRA array"""
+        region = (monitor['left'], monitor['top'],
+                  monitor['left'] + monitor['width'], monitor['top'] + monitor['height'])
+        # Capture region is fixed while dxcam runs, restart it when the IDE window moves
+        if region != self.region:
+            if self.camera.is_capturing:
+                self.camera.stop()
+            self.camera.start(region=region, target_fps=max(1, int(round(self.frame_rate))), video_mode=True)
+            self.region = region
+        # Frames live in dxcam's ring buffer, which is far deeper than our encoder queue
+        return self.camera.get_latest_frame()
+
+    def close(self):
+        if self.camera.is_capturing:
+            self.camera.stop()
+        self.camera.release()
+
+def make_capturer(frame_rate, multi_monitor):
+    """Picks dxcam (or bettercam) on Windows when installed (single monitor only), mss everywhere else"""
+    if IS_WINDOWS and dxcam is not None and not multi_monitor:
+        try:
+            capturer = DxcamCapturer(frame_rate)
+            force_print(f"INFO:Using {dxcam.__name__} for screen capture")
+            return capturer
+        except Exception as e:
+            force_print(f"INFO:{dxcam.__name__} unavailable, using mss for screen capture: {str(e)}")
+    return MssCapturer()
+
+# Frame table saved by the recorder: one row per written frame, in recording order.
+# ts is the monotonic capture time in seconds.
+MANIFEST_NAME = 'manifest.npy'
+MANIFEST_DTYPE = [('id', 'i8'), ('segment', 'i4'), ('ts', 'f8')]
+
+# Fallback JPEG frames of a segment are appended to a single frames_SS.dat file instead of
+# one file per frame. Each record is a little-endian length followed by the JPEG bytes,
+# a zero length repeats the previous frame of the segment.
+FRAMES_FILE_TEMPLATE = 'frames_{:02d}.dat'
+JPEG_RECORD_HEADER = struct.Struct('<I')
+
+class ControlFileWatcher:
+    """watchdog event handler re-checking the control files whenever one of them changes"""
+    CONTROL_FILES = ('.pause', '.stop')
+
+    def __init__(self, recorder):
+        self.recorder = recorder
+
+    def dispatch(self, event):
+        # Segment writes flood the temp directory with modify events, only control files matter
+        paths = (getattr(event, 'src_path', ''), getattr(event, 'dest_path', ''))
+        if any(os.path.basename(os.fsdecode(path)) in self.CONTROL_FILES for path in paths if path):
+            self.recorder.sync_control_files()
+
 class TimelapseRecorder:
     """
     Main class responsible for recording timelapses.
-    Handles screen capture, frame saving, and video creation.
+    Handles screen capture and streams frames straight into one video file per segment.
+    Encoding runs on a background thread fed by a bounded queue so codec stalls don't delay capture.
+    Falls back to appending JPEG frames to one file per segment when no video writer can be opened.
     Uses a file-based approach for control (stop/pause) to ensure reliability across platforms.
     """
     def __init__(self, output_dir, frame_rate, video_fps, quality, capture_area=None, multi_monitor=False, capture_ide_only=False):
@@ -206,14 +1018,48 @@ class TimelapseRecorder:
         self.capture_area = capture_area
         self.multi_monitor = multi_monitor
         self.capture_ide_only = capture_ide_only
+        # Grab regions, filled in once the capture backend reports its monitors
+        self.primary_monitor = None
+        self.base_monitor = None
+        self.capture_monitor = None
         self.frame_count = 0
-        self.should_stop = False
-        self.is_paused = False
-        self.last_window_update = 0
+        self.frames_encoded = 0
+        self.frames_dropped = 0
+        # Stop/pause state is kept in events so the capture loop checks flags, not files
+        self.stop_event = threading.Event()
+        self.pause_event = threading.Event()
+        self.control_poll_interval = 0.25  # Check control files every 0.25 seconds
+        self.last_window_update = float('-inf')
         self.window_update_interval = 0.5  # Update window position every 0.5 seconds
         self.current_segment = 0  # Track video segments for different resolutions
         self.current_resolution = None  # Track current resolution
         self.segments = []  # Store information about video segments
+        self.manifest = []  # (frame id, segment, capture time) per written frame
+        self.writer = None  # Streaming video writer for the current segment
+        self.writer_backends = None  # Backends not yet tried for the current segment
+        self.frame_buffer = None  # Reusable BGR buffer, sized per segment
+        self.frames_file = None  # Append-only fallback JPEG file of the current segment
+        self.last_frame_digest = None  # Fingerprint of the last written frame of the segment
+        self.jpeg_pool = None  # Thread pool encoding fallback JPEGs, created on first use
+        self.jpeg_workers = min(4, os.cpu_count() or 1)
+        self.jpeg_pending = deque()  # Encodes in capture order, None marks a repeated frame
+        self.frames_repeated = 0
+        
+        # libjpeg-turbo encodes fallback frames straight from BGRA, skipping the alpha strip
+        self.turbo_jpeg = None
+        if TurboJPEG is not None:
+            try:
+                self.turbo_jpeg = TurboJPEG()
+            except Exception as e:
+                print(f"INFO:TurboJPEG unavailable, using OpenCV for JPEG frames: {e}")
+        
+        load_strip_alpha_kernel()
+        
+        # Capture thread only grabs and enqueues, the encoder thread owns the writers
+        self.frame_queue = queue.Queue(maxsize=4)
+        self.encoder_thread = threading.Thread(target=self._encode_loop, daemon=True)
+        self.encoder_stopped = False
+        self.control_thread = threading.Thread(target=self._watch_control_files, daemon=True)
         
         # If capture_ide_only is True and no specific capture area is set, try to get IDE window
         if self.capture_ide_only and not self.capture_area:
@@ -221,46 +1067,249 @@ class TimelapseRecorder:
             self.capture_area = get_ide_window()
             if self.capture_area:
                 print(f"INFO:Found VS Code window at {self.capture_area}")
-                self.current_resolution = (self.capture_area['width'], self.capture_area['height'])
             else:
                 print("WARNING:Could not find VS Code window, falling back to full screen capture")
         
-        # Create directory for temporary frame storage
+        # Create directory for segment videos and fallback frame storage
         self.temp_dir = os.path.join(output_dir, 'temp')
         os.makedirs(self.temp_dir, exist_ok=True)
+        # Control file paths, checked on every poll or watcher event
+        self.pause_file = os.path.join(self.temp_dir, '.pause')
+        self.stop_file = os.path.join(self.temp_dir, '.stop')
         
         # Register signal handlers for stop
         signal.signal(signal.SIGTERM, self.handle_stop)
         signal.signal(signal.SIGINT, self.handle_stop)
         
-        # On Unix-like systems, try to use SIGUSR1 for pause
-        if platform.system() != 'Windows':
+        # On Unix-like systems, try to use SIGUSR1 for pause.
+        # Resolved once here so the control checks don't query the platform each time
+        self.file_pause_control = IS_WINDOWS
+        if not self.file_pause_control:
             try:
                 signal.signal(signal.SIGUSR1, self.handle_pause)
             except AttributeError:
                 print("INFO:SIGUSR1 not available, using file-based pause control")
+                self.file_pause_control = True
         
         # Register cleanup function
         atexit.register(self.cleanup)
 
-    def start_new_segment(self):
-        """Start a new video segment when resolution changes"""
+    def start_new_segment(self, resolution, backends=None):
+        """
+        Start a new video segment when resolution changes.
+        Each segment gets its own streaming writer since a VideoWriter has a fixed frame size.
+        backends continues an existing video_writer_backends() iterator instead of starting over.
+        """
+        self.finish_segment()
         self.current_segment += 1
+        self.current_resolution = resolution
         segment_info = {
-            'start_frame': self.frame_count,
-            'resolution': (self.capture_area['width'], self.capture_area['height']),
-            'frames': []
+            'start_frame': self.frames_encoded,
+            'resolution': resolution,
+            'frame_count': 0,
+            'path': None
         }
+
+        width, height = resolution
+        self.frame_buffer = np.empty((height, width, 3), dtype=np.uint8)
+        self.last_frame_digest = None
         self.segments.append(segment_info)
+        # Kept for the segment so a writer that dies can be replaced by the next backend
+        self.writer_backends = video_writer_backends() if backends is None else backends
+        self.open_segment_writer()
         force_print(f"INFO:Starting new video segment {self.current_segment} with resolution {segment_info['resolution']}")
         return segment_info
 
+    def open_segment_writer(self):
+        """Open the next writer backend for the current segment, or its JPEG frames file if none is left"""
+        segment_info = self.segments[-1]
+        width, height = self.current_resolution
+        segment_path = os.path.join(self.temp_dir, f'segment_{self.current_segment:02d}.mp4')
+        self.writer, segment_info['path'] = open_video_writer(segment_path, self.video_fps, width, height,
+                                                              accept_bgra=True, backends=self.writer_backends)
+        if self.writer is None:
+            force_print("WARNING:Failed to open video writer, falling back to JPEG frames")
+            segment_info['path'] = os.path.join(self.temp_dir, FRAMES_FILE_TEMPLATE.format(self.current_segment))
+            self.frames_file = open(segment_info['path'], 'wb', buffering=1 << 20)
+
+    def replace_failed_writer(self):
+        """
+        Continue in a new segment with the next backend after the writer died.
+        Whatever the dead writer managed to store stays a segment of its own, create_video
+        joins it with the rest or skips it if it can't be read, so its file never shadows the new output.
+        """
+        force_print("WARNING:Video writer failed, continuing in a new segment with the next encoder")
+        self.writer.release()
+        self.writer = None
+        self.start_new_segment(self.current_resolution, self.writer_backends)
+
+    def finish_segment(self):
+        """Release the streaming writer of the current segment, or finish its fallback JPEG file"""
+        if self.writer is not None:
+            self.writer.release()
+            self.writer = None
+        if self.frames_file is not None:
+            while self.jpeg_pending:
+                self.write_next_jpeg()
+            self.frames_file.close()
+            self.frames_file = None
+
+    def write_frame(self, frame, timestamp):
+        """
+        Write a BGRA frame to the current segment's writer, or as a JPEG to its frames file as fallback.
+        Frames identical to the previous one reuse its already converted pixels or JPEG.
+        """
+        digest = frame_digest(frame)
+        repeated = digest == self.last_frame_digest
+        self.last_frame_digest = digest
+
+        if self.writer is not None:
+            self.write_video_frame(frame, repeated)
+            if not self.writer.isOpened():
+                self.replace_failed_writer()
+                # The new segment has no previous frame to repeat
+                repeated = False
+                self.last_frame_digest = digest
+                if self.writer is not None:
+                    self.write_video_frame(frame, repeated)
+        if self.writer is None:
+            # An unchanged frame is stored as an empty record, not encoded again
+            self.write_jpeg(None if repeated else frame)
+
+        if repeated:
+            self.frames_repeated += 1
+        self.manifest.append((self.frames_encoded, self.current_segment, timestamp))
+        self.segments[-1]['frame_count'] += 1
+        self.frames_encoded += 1
+
+    def write_video_frame(self, frame, repeated):
+        """Send a BGRA frame to the segment's writer in the pixel format it takes"""
+        if repeated and hasattr(self.writer, 'repeat_last'):
+            # Skips the color conversion, the encoder turns the duplicate into a near-empty frame
+            self.writer.repeat_last()
+        elif getattr(self.writer, 'bgra', False):
+            # The YUV conversion in ffmpeg/libav drops alpha on its own, no separate copy needed
+            self.writer.write(frame)
+        else:
+            if not repeated:
+                # Drop alpha into the preallocated buffer, VideoWriter needs contiguous BGR
+                strip_alpha(frame, self.frame_buffer)
+            self.writer.write(self.frame_buffer)
+
+    def write_jpeg(self, frame):
+        """
+        Queue a BGRA frame for JPEG encoding on the JPEG thread pool, or None to repeat the previous one.
+        JPEG encoders release the GIL, so several frames encode in parallel; the number
+        of frames in flight is bounded so the pool can't pile up frames in memory.
+        """
+        if self.jpeg_pool is None:
+            self.jpeg_pool = ThreadPoolExecutor(max_workers=self.jpeg_workers)
+        while len(self.jpeg_pending) >= self.jpeg_workers * 2:
+            self.write_next_jpeg()
+        self.jpeg_pending.append(None if frame is None else self.jpeg_pool.submit(self.encode_jpeg, frame))
+
+    def write_next_jpeg(self):
+        """Append the oldest queued JPEG to the segment's frames file, keeping capture order"""
+        future = self.jpeg_pending.popleft()
+        try:
+            buf = b'' if future is None else future.result()
+        except Exception as e:
+            throttled_print('jpeg', f"ERROR:Frame encoding error: {str(e)}")
+            # Record the frame as a repeat of the previous one, so later records keep their positions
+            buf = b''
+        self.frames_file.write(JPEG_RECORD_HEADER.pack(len(buf)))
+        self.frames_file.write(buf)
+
+    def encode_jpeg(self, frame):
+        """JPEG pool worker: encode a BGRA frame, returns the JPEG bytes"""
+        # 4:2:0 like the final yuv420p video, finer chroma would be thrown away there anyway
+        if self.turbo_jpeg is not None:
+            return self.turbo_jpeg.encode(frame, quality=self.quality, pixel_format=TJPF_BGRA,
+                                          jpeg_subsample=TJSAMP_420)
+        if simplejpeg is not None:
+            # Reads the 4-byte BGRA pixels in place, no alpha strip needed
+            return simplejpeg.encode_jpeg(frame, quality=self.quality, colorspace='BGRA',
+                                          colorsubsampling='420', fastdct=True)
+        # Workers run concurrently, so each needs its own BGR copy instead of the shared frame buffer
+        ok, buf = cv2.imencode('.jpg', np.ascontiguousarray(frame[:, :, :3]), [
+            cv2.IMWRITE_JPEG_QUALITY, self.quality,
+            # Single-pass baseline JPEG, the frames are only decoded once more by create-video
+            cv2.IMWRITE_JPEG_OPTIMIZE, 0,
+            cv2.IMWRITE_JPEG_PROGRESSIVE, 0,
+        ])
+        if not ok:
+            raise RuntimeError("cv2.imencode failed")
+        return buf.tobytes()
+
+    def enqueue_frame(self, frame, timestamp):
+        """
+        Hand a frame and its capture time to the encoder thread without blocking the capture loop.
+        When the encoder falls behind the oldest queued frame is dropped to keep capture real-time.
+        """
+        while True:
+            try:
+                self.frame_queue.put_nowait((frame, timestamp))
+                return
+            except queue.Full:
+                try:
+                    self.frame_queue.get_nowait()
+                    self.frames_dropped += 1
+                except queue.Empty:
+                    pass
+
+    def _encode_loop(self):
+        """Encoder thread: writes queued frames until the None sentinel arrives"""
+        while True:
+            item = self.frame_queue.get()
+            if item is None:
+                break
+            frame, timestamp = item
+            try:
+                # Start a new segment on the first frame and whenever the frame size changes
+                resolution = (frame.shape[1], frame.shape[0])
+                if resolution != self.current_resolution:
+                    if self.segments:
+                        force_print(f"INFO:Window resolution changed from {self.current_resolution} to {resolution}")
+                    self.start_new_segment(resolution)
+                
+                self.write_frame(frame, timestamp)
+            except Exception as e:
+                force_print(f"ERROR:Frame encoding error: {str(e)}")
+
+    def stop_encoder(self):
+        """
+        Drain the frame queue, stop the encoder thread and finalize the last segment.
+        Runs once; record() and the atexit cleanup both call it.
+        """
+        if self.encoder_stopped:
+            return
+        self.encoder_stopped = True
+        if self.encoder_thread.is_alive():
+            self.frame_queue.put(None)
+            self.encoder_thread.join()
+        self.finish_segment()
+        self.finish_jpeg_writes()
+        self.save_manifest()
+
+    def finish_jpeg_writes(self):
+        """Shut the JPEG pool down, finish_segment already wrote out the pending frames"""
+        if self.jpeg_pool is not None:
+            self.jpeg_pool.shutdown()
+            self.jpeg_pool = None
+
+    def save_manifest(self):
+        """Store the frame table next to the segments so create_video doesn't have to parse file names"""
+        if not self.manifest:
+            return
+        manifest = np.array(self.manifest, dtype=MANIFEST_DTYPE)
+        np.save(os.path.join(self.temp_dir, MANIFEST_NAME), manifest)
+
     def update_window_position(self):
         """Update the window position and size if we're recording only the IDE"""
         if not self.capture_ide_only:
             return
             
-        current_time = time.time()
+        current_time = time.monotonic()
         if current_time - self.last_window_update < self.window_update_interval:
             return
             
@@ -268,53 +1317,138 @@ class TimelapseRecorder:
         if new_area:
             if new_area != self.capture_area:
                 force_print(f"DEBUG:Window position/size changed: {new_area}")
-                # Check if resolution changed
-                new_resolution = (new_area['width'], new_area['height'])
-                if new_resolution != self.current_resolution:
-                    force_print(f"INFO:Window resolution changed from {self.current_resolution} to {new_resolution}")
-                    self.current_resolution = new_resolution
-                    if self.frame_count > 0:  # Don't create segment for initial resolution
-                        self.start_new_segment()
+                # Resolution changes are picked up from the captured frame size,
+                # which starts a new segment in record()
                 self.capture_area = new_area
+                self.capture_monitor = self.resolve_capture_monitor()
         else:
-            force_print("WARNING:Lost track of VS Code window")
+            throttled_print('window', "WARNING:Lost track of VS Code window")
         
         self.last_window_update = current_time
 
+    def resolve_capture_monitor(self):
+        """
+        Convert the capture area to an mss-style monitor dict clamped to the primary monitor.
+        Falls back to the base monitor without a capture area, returns None if the area is unusable.
+        """
+        if not self.capture_area:
+            return self.base_monitor
+        primary_monitor = self.primary_monitor
+
+        # Convert our coordinates to mss format
+        monitor = {
+            'left': int(self.capture_area['x']),
+            'top': int(self.capture_area['y']),
+            'width': int(self.capture_area['width']),
+            'height': int(self.capture_area['height']),
+            'mon': 1,  # Use primary monitor as reference
+        }
+        
+        # Validate capture area
+        if monitor['width'] <= 0 or monitor['height'] <= 0:
+            force_print(f"WARNING:Invalid capture area dimensions: {monitor}")
+            return None
+        if monitor['left'] < 0 or monitor['top'] < 0:
+            force_print(f"WARNING:Invalid capture area position: {monitor}")
+            return None
+        
+        # Check if the capture area is within the primary monitor bounds
+        if (monitor['left'] + monitor['width'] > primary_monitor['width'] or
+            monitor['top'] + monitor['height'] > primary_monitor['height']):
+            force_print("WARNING:Capture area extends beyond primary monitor bounds, adjusting...")
+            monitor['width'] = min(monitor['width'], primary_monitor['width'] - monitor['left'])
+            monitor['height'] = min(monitor['height'], primary_monitor['height'] - monitor['top'])
+        return monitor
+
     def handle_stop(self, signum, frame):
         """Signal handler for stop signals"""
         print("\nINFO:Received stop signal")
-        self.should_stop = True
+        self.stop_event.set()
 
     def handle_pause(self, signum, frame):
         """Signal handler for pause signal"""
-        self.is_paused = not self.is_paused
-        state = "paused" if self.is_paused else "resumed"
+        if self.pause_event.is_set():
+            self.pause_event.clear()
+        else:
+            self.pause_event.set()
+        state = "paused" if self.pause_event.is_set() else "resumed"
         print(f"\nINFO:Recording {state}")
 
     def check_pause_file(self):
         """Check for pause file in temp directory"""
-        pause_file = os.path.join(self.temp_dir, '.pause')
-        return os.path.exists(pause_file)
+        return os.path.exists(self.pause_file)
+
+    def check_stop_file(self):
+        """
+        Check for stop file in temp directory.
+        Signals can't be delivered gracefully on Windows, and the streaming writer
+        must be released for the video container to be readable.
+        """
+        return os.path.exists(self.stop_file)
+
+    def sync_control_files(self):
+        """Mirror the stop/pause files into the control events"""
+        if self.check_stop_file():
+            if not self.stop_event.is_set():
+                force_print("\nINFO:Found stop file")
+            self.stop_event.set()
+            return
+        
+        # Pause is file-based on Windows only, other platforms toggle it via SIGUSR1
+        if self.file_pause_control:
+            if self.check_pause_file():
+                self.pause_event.set()
+            else:
+                self.pause_event.clear()
+
+    def _watch_control_files(self):
+        """
+        Control thread: mirrors the stop/pause files into events, keeping the
+        file-system checks off the capture loop. Reacts to file system events
+        when watchdog is installed and polls the files otherwise.
+        """
+        if Observer is not None:
+            try:
+                observer = Observer()
+                observer.schedule(ControlFileWatcher(self), self.temp_dir)
+                observer.start()
+            except Exception as e:
+                print(f"INFO:File watcher unavailable, polling control files: {str(e)}")
+            else:
+                # Catch files created before the watch was in place
+                self.sync_control_files()
+                self.stop_event.wait()
+                observer.stop()
+                observer.join()
+                return
+        
+        while not self.stop_event.is_set():
+            self.sync_control_files()
+            self.stop_event.wait(self.control_poll_interval)
 
     def cleanup(self):
         """
         Cleanup function that runs on process exit.
-        Ensures video is created and temporary files are cleaned up.
+        Releases the streaming writer so the last segment is finalized.
         Critical for handling unexpected termination scenarios.
         """
         print("\nINFO:Running cleanup...")
+        self.stop_encoder()
         print(f"INFO:Captured {self.frame_count} frames in {len(self.segments)} segments")
+        if self.frames_dropped:
+            print(f"INFO:Dropped {self.frames_dropped} frames while the encoder was busy")
+        if self.frames_repeated:
+            print(f"INFO:Reused {self.frames_repeated} unchanged frames")
         
         # Print segment information
         for i, segment in enumerate(self.segments):
-            print(f"INFO:Segment {i + 1}: {len(segment['frames'])} frames at resolution {segment['resolution']}")
+            print(f"INFO:Segment {i + 1}: {segment['frame_count']} frames at resolution {segment['resolution']}")
 
     def record(self):
         """
         Main recording loop that captures screen frames at specified intervals.
         Implements pause functionality through both signals and file-based control.
-        Uses mss for efficient screen capture.
+        Uses dxcam on Windows when available and mss otherwise for screen capture.
         """
         try:
             force_print("\nINFO:Starting recording process")
@@ -322,279 +1456,683 @@ class TimelapseRecorder:
             force_print(f"DEBUG:Multi-monitor mode: {self.multi_monitor}")
             force_print(f"DEBUG:Record only IDE: {self.capture_ide_only}")
             
-            # Initialize first segment
-            if self.capture_area:
-                current_segment = self.start_new_segment()
+            self.encoder_thread.start()
+            self.control_thread.start()
             
             # Initialize screen capture
-            with mss.mss() as sct:
-                force_print("\nDEBUG:MSS Configuration:")
-                force_print(f"DEBUG:Available monitors: {json.dumps(sct.monitors, indent=2)}")
-                force_print(f"DEBUG:Primary monitor: {json.dumps(sct.monitors[1], indent=2)}")  # monitors[1] is primary
+            capturer = make_capturer(self.frame_rate, self.multi_monitor)
+            try:
+                force_print("\nDEBUG:Capture Configuration:")
+                force_print(f"DEBUG:Available monitors: {json.dumps(capturer.monitors, indent=2)}")
+                force_print(f"DEBUG:Primary monitor: {json.dumps(capturer.monitors[1], indent=2)}")  # monitors[1] is primary
                 
                 # Get primary monitor bounds
-                primary_monitor = sct.monitors[1]
+                primary_monitor = capturer.monitors[1]
                 force_print(f"DEBUG:Primary monitor bounds: {json.dumps(primary_monitor, indent=2)}")
                 
-                last_capture = 0
-                capture_interval = 1.0 / self.frame_rate
+                # mss convention: monitors[0] is the bounding box of all screens, monitors[1] the primary
+                self.primary_monitor = primary_monitor
+                self.base_monitor = capturer.monitors[0] if self.multi_monitor else primary_monitor
+                # Cached grab region, rebuilt by update_window_position when the capture area moves
+                self.capture_monitor = self.resolve_capture_monitor()
+                
+                # Deadlines in integer nanoseconds, float seconds would accumulate rounding over long sessions
+                capture_interval = int(1e9 / self.frame_rate)
+                next_capture = time.monotonic_ns()
 
                 force_print(f"\nINFO:Starting capture with frame rate {self.frame_rate} fps")
-                force_print(f"INFO:Saving frames to {self.temp_dir}")
+                force_print(f"INFO:Writing segments to {self.temp_dir}")
 
-                while not self.should_stop:
+                while not self.stop_event.is_set():
                     try:
-                        if platform.system() == 'Windows':
-                            self.is_paused = self.check_pause_file()
-                        
-                        if self.is_paused:
-                            time.sleep(0.1)
+                        if self.pause_event.is_set():
+                            self.stop_event.wait(0.1)
+                            next_capture = time.monotonic_ns()
                             continue
 
+                        # Sleep until the next capture is due, waking early on stop
+                        current_time = time.monotonic_ns()
+                        if current_time < next_capture:
+                            self.stop_event.wait((next_capture - current_time) / 1e9)
+                            continue
+                        
+                        # Schedule from the target time to avoid drift, but don't burst to catch up after a stall
+                        next_capture += capture_interval
+                        if next_capture < current_time:
+                            next_capture = current_time + capture_interval
+
                         # Update window position if needed
                         self.update_window_position()
                         
-                        current_time = time.time()
-                        if current_time - last_capture >= capture_interval:
-                            # Set up monitor configuration
-                            monitor = primary_monitor if not self.multi_monitor else sct.monitors[0]
-                            if self.capture_area:
-                                # Convert our coordinates to mss format
-                                monitor = {
-                                    'left': int(self.capture_area['x']),
-                                    'top': int(self.capture_area['y']),
-                                    'width': int(self.capture_area['width']),
-                                    'height': int(self.capture_area['height']),
-                                    'mon': 1,  # Use primary monitor as reference
-                                }
-                                
-                                # Validate capture area
-                                if monitor['width'] <= 0 or monitor['height'] <= 0:
-                                    force_print(f"WARNING:Invalid capture area dimensions: {monitor}")
-                                    continue
-                                if monitor['left'] < 0 or monitor['top'] < 0:
-                                    force_print(f"WARNING:Invalid capture area position: {monitor}")
-                                    continue
-                                
-                                # Check if the capture area is within the primary monitor bounds
-                                if (monitor['left'] + monitor['width'] > primary_monitor['width'] or
-                                    monitor['top'] + monitor['height'] > primary_monitor['height']):
-                                    force_print("WARNING:Capture area extends beyond primary monitor bounds, adjusting...")
-                                    monitor['width'] = min(monitor['width'], primary_monitor['width'] - monitor['left'])
-                                    monitor['height'] = min(monitor['height'], primary_monitor['height'] - monitor['top'])
-
-                            try:
-                                screenshot = sct.grab(monitor)
-                                if self.frame_count == 0:  # Log only for first frame
-                                    force_print(f"\nDEBUG:First frame capture:")
-                                    force_print(f"DEBUG:Captured frame size: {screenshot.width}x{screenshot.height}")
-                                    force_print(f"DEBUG:Monitor used: {json.dumps(monitor, indent=2)}")
-                                    force_print(f"DEBUG:Screenshot bounds: left={screenshot.left}, top={screenshot.top}, width={screenshot.width}, height={screenshot.height}")
-                            except Exception as e:
-                                force_print(f"ERROR:Failed to capture frame: {str(e)}")
+                        monitor = self.capture_monitor
+                        if monitor is None:
+                            continue
+
+                        try:
+                            frame = capturer.grab(monitor)
+                        except Exception as e:
+                            # A persistent failure repeats every frame, don't flood stdout with it
+                            if throttled_print('grab', f"ERROR:Failed to capture frame: {str(e)}"):
                                 force_print(f"DEBUG:Monitor config used: {json.dumps(monitor, indent=2)}")
-                                continue  # Skip this frame and try again
-                            
-                            frame = np.array(screenshot, dtype=np.uint8)
-                            if self.frame_count == 0:  # Log only for first frame
-                                force_print(f"DEBUG:Frame array shape: {frame.shape}")
-                            
-                            if len(frame.shape) == 3:
-                                if frame.shape[2] == 4:
-                                    frame = cv2.cvtColor(frame, cv2.COLOR_BGRA2RGB)
-                                elif frame.shape[2] == 3:
-                                    frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                            
-                            # Save frame with segment information
-                            frame_path = os.path.join(self.temp_dir, f'frame_{self.current_segment:02d}_{self.frame_count:06d}.jpg')
-                            cv2.imwrite(frame_path, cv2.cvtColor(frame, cv2.COLOR_RGB2BGR), [cv2.IMWRITE_JPEG_QUALITY, self.quality])
-                            
-                            # Add frame to current segment
-                            if self.segments:
-                                self.segments[-1]['frames'].append(frame_path)
-                            
-                            self.frame_count += 1
-                            last_capture = current_time
-
-                            if self.frame_count % 10 == 0:
-                                force_print(f"INFO:Captured {self.frame_count} frames")
+                            continue  # Skip this frame and try again
+                        if frame is None:
+                            continue  # No new frame from the capture backend yet
+                        
+                        if self.frame_count == 0:  # Log only for first frame
+                            force_print(f"\nDEBUG:First frame capture:")
+                            force_print(f"DEBUG:Captured frame size: {frame.shape[1]}x{frame.shape[0]}")
+                            force_print(f"DEBUG:Monitor used: {json.dumps(monitor, indent=2)}")
+                            force_print(f"DEBUG:Frame array shape: {frame.shape}")
+                        
+                        # Hand frame over to the encoder thread
+                        self.enqueue_frame(frame, current_time / 1e9)
+                        
+                        self.frame_count += 1
+
+                        if self.frame_count % 50 == 0:
+                            force_print(f"INFO:Captured {self.frame_count} frames")
                     except Exception as e:
-                        force_print(f"ERROR:Frame capture error: {str(e)}")
-                        import traceback
-                        force_print(f"DEBUG:Stack trace: {traceback.format_exc()}")
+                        if throttled_print('capture', f"ERROR:Frame capture error: {str(e)}"):
+                            force_print(f"DEBUG:Stack trace: {traceback.format_exc()}")
                         continue  # Skip this frame and try again
 
+                self.stop_encoder()
                 force_print("\nINFO:Recording stopped")
+            finally:
+                capturer.close()
 
         except Exception as e:
             force_print(f"ERROR:{str(e)}")
-            import traceback
             force_print(f"DEBUG:Stack trace: {traceback.format_exc()}")
             sys.exit(1)
 
-def create_video(frames_dir, output_path, fps):
-    """Creates video from captured frames using OpenCV"""
-    try:
-        # Get list of frame files and sort them by segment and frame number
-        frame_files = sorted([f for f in os.listdir(frames_dir) if f.startswith('frame_') and f.endswith('.jpg')])
-        if not frame_files:
-            print("ERROR:No frames found for video creation")
-            return False
+def find_segment_video(frames_dir, segment_num):
+    """Returns the path of a segment's non-empty video file, or None if it went to JPEG frames"""
+    for ext in ('.mp4', '.avi'):
+        path = os.path.join(frames_dir, f'segment_{segment_num:02d}{ext}')
+        try:
+            # Skip empty containers left behind by codecs that failed to open
+            if os.stat(path).st_size > 0:
+                return path
+        except OSError:
+            continue
+    return None
 
-        # Group frames by segment
-        segments = {}
-        for frame_file in frame_files:
-            # Extract segment number from filename (frame_SS_NNNNNN.jpg)
-            segment_num = int(frame_file.split('_')[1])
-            if segment_num not in segments:
-                segments[segment_num] = []
-            segments[segment_num].append(frame_file)
+def index_jpeg_records(frames_path):
+    """
+    Returns (offset, size) of every frame in a fallback frames file, repeated frames
+    pointing at the JPEG they repeat. A record cut short by an interrupted recording ends the list.
+    """
+    records = []
+    file_size = os.path.getsize(frames_path)
+    previous = None
+    offset = 0
+    with open(frames_path, 'rb') as f:
+        while offset + JPEG_RECORD_HEADER.size <= file_size:
+            size, = JPEG_RECORD_HEADER.unpack(f.read(JPEG_RECORD_HEADER.size))
+            offset += JPEG_RECORD_HEADER.size
+            if size == 0:
+                if previous is not None:
+                    records.append(previous)
+                continue
+            if offset + size > file_size:
+                break
+            previous = (offset, size)
+            records.append(previous)
+            offset += size
+            f.seek(offset)
+    return records
 
-        if not segments:
-            print("ERROR:No valid segments found")
-            return False
+def load_manifest(frames_dir):
+    """Returns the recorder's frame table, or None for recordings made without one"""
+    manifest_path = os.path.join(frames_dir, MANIFEST_NAME)
+    if not os.path.exists(manifest_path):
+        return None
+    return np.load(manifest_path)
 
-        # Find maximum resolution across all segments
-        max_width = 0
-        max_height = 0
-        for segment_num, segment_frames in sorted(segments.items()):
-            if not segment_frames:
+def collect_segments(frames_dir, manifest=None):
+    """
+    Group the recording's temporary files by segment number.
+    Each segment is either a streamed video file (segment_SS.ext) or, when no video
+    writer could be opened, a frames file of JPEG records (frames_SS.dat) with its index.
+    With the recorder's manifest the paths are built from segment numbers, without listing the directory,
+    and a frames file is read up to the records the manifest lists for it.
+    """
+    segments = {}
+    if manifest is not None:
+        segment_nums, frame_counts = np.unique(manifest['segment'], return_counts=True)
+        for segment_num, frame_count in zip(segment_nums.tolist(), frame_counts.tolist()):
+            video_path = find_segment_video(frames_dir, segment_num)
+            if video_path:
+                segments[segment_num] = ('video', video_path)
                 continue
-            first_frame = cv2.imread(os.path.join(frames_dir, segment_frames[0]))
-            if first_frame is not None:
-                height, width = first_frame.shape[:2]
-                max_width = max(max_width, width)
-                max_height = max(max_height, height)
+            frames_path = os.path.join(frames_dir, FRAMES_FILE_TEMPLATE.format(segment_num))
+            if os.path.exists(frames_path):
+                records = index_jpeg_records(frames_path)[:frame_count]
+                if records:
+                    segments[segment_num] = ('frames', (frames_path, records))
+        return segments
 
-        if max_width == 0 or max_height == 0:
-            print("ERROR:Could not determine maximum resolution")
-            return False
+    with os.scandir(frames_dir) as entries:
+        for entry in entries:
+            name = entry.name
+            if name.startswith('segment_'):
+                # Skip empty containers left behind by codecs that failed to open
+                if entry.stat().st_size == 0:
+                    continue
+                segment_num = int(name.split('_')[1].split('.')[0])
+                segments[segment_num] = ('video', entry.path)
+            elif name.startswith('frames_') and name.endswith('.dat'):
+                segment_num = int(name[len('frames_'):-len('.dat')])
+                segments.setdefault(segment_num, ('frames', (entry.path, index_jpeg_records(entry.path))))
+    # Drop fallback files that never got a complete frame
+    return {num: segment for num, segment in segments.items() if segment[0] == 'video' or segment[1][1]}
 
-        print(f"INFO:Maximum resolution across all segments: {max_width}x{max_height}")
+def iter_jpeg_bytes(source):
+    """Yields the JPEG bytes of each frame of a fallback frames file, repeats as the same object"""
+    frames_path, records = source
+    last_record = None
+    buf = None
+    with open(frames_path, 'rb') as f:
+        for record in records:
+            if record != last_record:
+                offset, size = record
+                f.seek(offset)
+                buf = f.read(size)
+                last_record = record
+            yield buf
 
-        # Get preferred codec from arguments, with fallbacks
-        preferred_codec = os.environ.get('TIMELAPSE_CODEC', 'H264')
-        
-        # Try different codecs in order of preference
-        codecs = []
-        
-        # Start with preferred codec
-        if preferred_codec in ['H265', 'AV1', 'H264', 'mp4v', 'XVID', 'MJPG']:
-            if preferred_codec == 'H265':
-                codec_options = [
-                    ('hevc', '.mp4'),
-                    ('hvc1', '.mp4'),
-                    ('x265', '.mp4')
-                ]
-            elif preferred_codec == 'AV1':
-                codec_options = [
-                    ('av01', '.mp4'),
-                    ('aom0', '.mp4')
-                ]
-            else:
-                ext = '.mp4' if preferred_codec in ['H264', 'mp4v'] else '.avi'
-                codec_options = [(preferred_codec, ext)]
-            
-            codecs.extend(codec_options)
-        
-        # Add fallback codecs
-        fallback_codecs = [
-            ('H264', '.mp4'),
-            ('mp4v', '.mp4'),
-            ('XVID', '.avi'),
-            ('MJPG', '.avi')
-        ]
-        
-        for codec, ext in fallback_codecs:
-            if codec != preferred_codec:
-                codecs.append((codec, ext))
+def read_segment_info(segment):
+    """Returns (width, height, frame_count) of a segment, or None if it can't be read"""
+    kind, source = segment
+    if kind == 'video':
+        cap = cv2.VideoCapture(source)
+        try:
+            if not cap.isOpened():
+                return None
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+            frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            return width, height, frame_count
+        finally:
+            cap.release()
 
-        # Initialize video writer with maximum resolution
-        out = None
-        final_path = None
+    frame_count = len(source[1])
+    try:
+        first_jpeg = next(iter_jpeg_bytes(source))
+    except (OSError, StopIteration):
+        return None
+    if simplejpeg is not None:
+        # Only the header is needed for the frame size
+        try:
+            height, width = simplejpeg.decode_jpeg_header(first_jpeg)[:2]
+            return width, height, frame_count
+        except ValueError:
+            return None
+
+    first_frame = decode_jpeg(first_jpeg)
+    if first_frame is None:
+        return None
+    height, width = first_frame.shape[:2]
+    return width, height, frame_count
+
+def decode_jpeg(buf):
+    """Decodes a fallback JPEG frame to BGR, returns None if it can't be decoded"""
+    if simplejpeg is None:
+        return cv2.imdecode(np.frombuffer(buf, dtype=np.uint8), cv2.IMREAD_COLOR)
+    try:
+        return simplejpeg.decode_jpeg(buf, colorspace='BGR', fastdct=True)
+    except ValueError:
+        return None
+
+def iter_prefetched(items, depth):
+    """
+    Runs an iterator on a producer thread and yields its items through a bounded queue,
+    so producing the next items overlaps with the caller's work on the current one.
+    At most depth items wait in the queue while one more is being produced.
+    """
+    results = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+    errors = []
+
+    def produce():
+        try:
+            for item in items:
+                if stop.is_set():
+                    break
+                results.put(item)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            close = getattr(items, 'close', None)
+            if close is not None:
+                close()
+            results.put(done)
 
-        for codec, ext in codecs:
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = results.get()
+            if item is done:
+                break
+            yield item
+        if errors:
+            raise errors[0]
+    finally:
+        # Unblock the producer if the caller stopped early
+        stop.set()
+        while producer.is_alive():
             try:
-                fourcc = cv2.VideoWriter_fourcc(*codec)
-                test_path = output_path.replace('.mp4', ext)
-                
-                if codec in ['hevc', 'hvc1', 'x265', 'av01', 'aom0']:
-                    test_writer = cv2.VideoWriter(test_path, fourcc, fps, (max_width, max_height), 
-                                                params=[
-                                                    cv2.VIDEOWRITER_PROP_QUALITY, 100,
-                                                    cv2.VIDEOWRITER_PROP_BITRATE, 8000000
-                                                ])
-                else:
-                    test_writer = cv2.VideoWriter(test_path, fourcc, fps, (max_width, max_height))
-                
-                if test_writer.isOpened():
-                    out = test_writer
-                    final_path = test_path
-                    print(f"INFO:Successfully initialized video writer with codec {codec}")
+                results.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+def iter_video_frames(video_path):
+    """Yields the decoded frames of a video file"""
+    cap = cv2.VideoCapture(video_path)
+    try:
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            yield frame
+    finally:
+        cap.release()
+
+def iter_segment_frames(segment):
+    """Yields the BGR frames of a segment in recording order"""
+    kind, source = segment
+    if kind == 'video':
+        # Decode on a producer thread so it overlaps with the caller's encoding,
+        # the bounded queue caps memory at a few frames
+        yield from iter_prefetched(iter_video_frames(source), 8)
+    else:
+        # Decode a few frames ahead on a thread pool while the caller encodes,
+        # JPEG decoders release the GIL so both run in parallel
+        workers = min(4, os.cpu_count() or 1)
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = deque()
+            last_buf = None
+            last_future = None
+
+            def submit(buf):
+                # Repeated frames share the JPEG bytes, decode them only once
+                nonlocal last_buf, last_future
+                if buf is not last_buf:
+                    last_buf = buf
+                    last_future = pool.submit(decode_jpeg, buf)
+                pending.append(last_future)
+
+            jpegs = iter_jpeg_bytes(source)
+            for buf in jpegs:
+                submit(buf)
+                if len(pending) >= workers * 2:
                     break
-                else:
-                    test_writer.release()
+            while pending:
+                frame = pending.popleft().result()
+                buf = next(jpegs, None)
+                if buf is not None:
+                    submit(buf)
+                if frame is not None:
+                    yield frame
+
+def fit_to_canvas(seg_width, seg_height, max_width, max_height):
+    """Returns (scaled_width, scaled_height, pad_x, pad_y) centering a segment on the final canvas"""
+    # Calculate scaling and padding
+    scale = min(max_width / seg_width, max_height / seg_height)
+    scaled_width = int(seg_width * scale)
+    scaled_height = int(seg_height * scale)
+    
+    # Calculate padding to center the frame
+    pad_x = (max_width - scaled_width) // 2
+    pad_y = (max_height - scaled_height) // 2
+    return scaled_width, scaled_height, pad_x, pad_y
+
+# Scaled frames prepared ahead of the encoder in create-video
+FIT_PREFETCH = 4
+
+def iter_fitted_frames(segment, seg_width, seg_height, max_width, max_height, canvas_count=1):
+    """
+    Yields the frames of a segment scaled and padded to the final resolution.
+    Unless the segment already has that size, canvases are reused round-robin:
+    a yielded frame is only valid until canvas_count more frames have been produced.
+    """
+    if (seg_width, seg_height) == (max_width, max_height):
+        # Already at the final resolution, nothing to scale or pad
+        yield from iter_segment_frames(segment)
+        return
+    scaled_width, scaled_height, pad_x, pad_y = fit_to_canvas(seg_width, seg_height, max_width, max_height)
+    # The black border is identical for every frame, only the centered region gets overwritten
+    canvases = [np.zeros((max_height, max_width, 3), dtype=np.uint8) for _ in range(canvas_count)]
+    regions = [canvas[pad_y:pad_y + scaled_height, pad_x:pad_x + scaled_width] for canvas in canvases]
+    scaled = scaled_width != seg_width or scaled_height != seg_height
+    for i, frame in enumerate(iter_segment_frames(segment)):
+        canvas = canvases[i % canvas_count]
+        region = regions[i % canvas_count]
+        if not scaled:
+            np.copyto(region, frame)
+        else:
+            # Scale straight into the canvas, no intermediate frame
+            cv2.resize(frame, (scaled_width, scaled_height), dst=region, interpolation=cv2.INTER_LANCZOS4)
+        yield canvas
+
+def iter_output_frames(segment, seg_width, seg_height, max_width, max_height):
+    """
+    Yields the fitted frames of a segment with scaling running on a producer thread,
+    so cv2.resize and the caller's encoder (both release the GIL) work in parallel.
+    """
+    # Enough canvases for the queued frames, the one being scaled and the one being encoded
+    frames = iter_fitted_frames(segment, seg_width, seg_height, max_width, max_height,
+                                canvas_count=FIT_PREFETCH + 2)
+    return iter_prefetched(frames, FIT_PREFETCH)
+
+def split_into_chunks(segments, segment_infos, workers):
+    """
+    Split the segments into contiguous encode jobs of (segment, width, height).
+    Video segments are one job each; JPEG frame records are split so every worker gets a share.
+    """
+    jobs = []
+    for segment_num, (seg_width, seg_height, frame_count) in sorted(segment_infos.items()):
+        kind, source = segments[segment_num]
+        if kind == 'video':
+            jobs.append(((kind, source), seg_width, seg_height))
+            continue
+        frames_path, records = source
+        chunk_size = max(100, -(-len(records) // workers))
+        for start in range(0, len(records), chunk_size):
+            jobs.append(((kind, (frames_path, records[start:start + chunk_size])), seg_width, seg_height))
+    return jobs
+
+# Consumer GPUs cap concurrent encode sessions (3 to 8 for NVENC), stay below that
+MAX_HARDWARE_SESSIONS = 3
+
+def parallel_encode_plan():
+    """
+    Pick the writer backend for a parallel encode once, so all chunks share one encoder
+    and the stream copy join doesn't mix codecs. Returns (backend, workers), or (None, 1)
+    when only OpenCV is left, its codec choice happens per writer.
+    """
+    backend = next(video_writer_backends())
+    if backend[0] == 'cv2':
+        return None, 1
+    workers = os.cpu_count() or 1
+    if backend[1] not in SOFTWARE_ENCODERS.values():
+        workers = min(workers, MAX_HARDWARE_SESSIONS)
+    return backend, workers
+
+def encode_chunk(segment, seg_width, seg_height, chunk_path, fps, max_width, max_height, backend):
+    """Worker process: encodes one chunk at the final resolution with backend, returns its path or None"""
+    out, final_path = open_video_writer(chunk_path, fps, max_width, max_height, backends=[backend])
+    if out is None:
+        return None
+    for canvas in iter_output_frames(segment, seg_width, seg_height, max_width, max_height):
+        out.write(canvas)
+        if not out.isOpened():
+            break
+    out.release()
+    # The parent falls back to a sequential encode with the remaining backends
+    return None if getattr(out, 'failed', False) else final_path
+
+def remove_files(paths):
+    """Delete the given files, ignoring ones that are already gone"""
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def create_video_parallel(jobs, frames_dir, output_path, fps, max_width, max_height, ffmpeg_path, backend, workers):
+    """
+    Encodes the chunks in a process pool and joins them with ffmpeg's concat demuxer.
+    The join is a stream copy, so the only encoding work is the parallel one.
+    Returns False if any chunk fails, the caller then encodes sequentially.
+    """
+    chunk_paths = [os.path.join(frames_dir, f'chunk_{i:04d}.mp4') for i in range(len(jobs))]
+    results = [None] * len(jobs)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(encode_chunk, segment, seg_width, seg_height,
+                        chunk_paths[i], fps, max_width, max_height, backend): i
+            for i, (segment, seg_width, seg_height) in enumerate(jobs)
+        }
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                results[futures[future]] = future.result()
             except Exception as e:
-                print(f"INFO:Codec {codec} failed: {str(e)}")
-                continue
+                # A crashed worker or writer only fails its chunk
+                print(f"WARNING:Chunk {futures[future]} failed: {str(e)}")
+            print(f"PROGRESS:{int(done / len(jobs) * 100)}")
+
+    if any(path is None for path in results):
+        print("WARNING:Failed to encode some chunks")
+        remove_files(chunk_paths)
+        return False
 
-        if out is None:
-            print("ERROR:Failed to create video writer")
+    concat_list = os.path.join(frames_dir, 'concat.txt')
+    with open(concat_list, 'w', encoding='utf-8') as f:
+        for path in results:
+            # The concat demuxer quotes with ', a literal one is written as '\''
+            escaped = os.path.abspath(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+    result = subprocess.run(
+        [ffmpeg_path, '-y', '-loglevel', 'error', '-f', 'concat', '-safe', '0',
+         '-i', concat_list, '-c', 'copy', '-f', 'mp4', output_path],
+        capture_output=True, text=True
+    )
+    remove_files(results)
+    remove_files([concat_list])
+
+    if result.returncode != 0:
+        print(f"WARNING:ffmpeg concat failed: {result.stderr.strip()}")
+        return False
+    return True
+
+def encode_frame_sequence(source, output_path, fps, ffmpeg_path):
+    """
+    Encodes the JPEG fallback frames of one segment with a single ffmpeg call.
+    The JPEG bytes are piped into ffmpeg's image2pipe demuxer, decoding and encoding with a
+    hardware encoder (or multi-threaded x264) happen in ffmpeg without touching pixels in Python.
+    Returns False if ffmpeg fails.
+    """
+    # Hand the encode to the GPU when a hardware encoder works, x264 otherwise
+    encoder = find_hardware_encoder() or find_ffmpeg_software_encoder() or 'libx264'
+
+    # stderr goes to a file, a pipe nobody reads while we feed stdin could fill up and stall ffmpeg
+    with tempfile.TemporaryFile() as stderr:
+        proc = subprocess.Popen(
+            [ffmpeg_path, '-y', '-loglevel', 'error', '-f', 'image2pipe', '-c:v', 'mjpeg',
+             '-framerate', str(fps), '-i', '-', *ffmpeg_encode_args(encoder, fps), output_path],
+            stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=stderr
+        )
+        try:
+            for buf in iter_jpeg_bytes(source):
+                proc.stdin.write(buf)
+        except OSError:
+            pass  # ffmpeg exited early, its error is reported below
+        finally:
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+        if proc.wait() != 0:
+            stderr.seek(0)
+            print(f"WARNING:ffmpeg failed to encode frames: {stderr.read().decode(errors='replace').strip()}")
             return False
+    return True
 
-        # Process all segments
-        total_frames = sum(len(frames) for frames in segments.values())
-        frames_written = 0
+def mux_jpeg_frames(source, output_path, fps):
+    """
+    Writes JPEG fallback frames of one segment into an MJPEG video through PyAV.
+    Every JPEG record already is a valid MJPEG packet, so this is pure I/O without touching pixels.
+    """
+    info = read_segment_info(('frames', source))
+    if info is None:
+        return False
+    width, height, frame_count = info
 
-        for segment_num, segment_frames in sorted(segments.items()):
-            if not segment_frames:
-                continue
+    container = None
+    try:
+        rate = Fraction(fps).limit_denominator(1001)
+        container = av.open(output_path, mode='w')
+        stream = container.add_stream('mjpeg', rate=rate)
+        stream.width = width
+        stream.height = height
+        stream.pix_fmt = 'yuvj420p'
+        last_progress = -1
+        for i, buf in enumerate(iter_jpeg_bytes(source)):
+            packet = av.Packet(buf)
+            packet.stream = stream
+            packet.time_base = 1 / rate
+            packet.pts = packet.dts = i
+            packet.is_keyframe = True
+            container.mux(packet)
+            
+            progress = (i + 1) * 100 // frame_count
+            if progress != last_progress:
+                force_print(f"PROGRESS:{progress}")
+                last_progress = progress
+        return True
+    except Exception as e:
+        print(f"WARNING:Failed to mux JPEG frames: {str(e)}")
+        return False
+    finally:
+        if container is not None:
+            container.close()
+
+def write_segments(out, segments, segment_infos, max_width, max_height):
+    """
+    Write all segments to out at the common resolution and release it.
+    Returns False if the writer died on the way.
+    """
+    total_frames = sum(info[2] for info in segment_infos.values())
+    frames_written = 0
+    last_progress = -1
 
-            print(f"\nINFO:Processing segment {segment_num}")
+    for segment_num, (seg_width, seg_height, _) in sorted(segment_infos.items()):
+        print(f"\nINFO:Processing segment {segment_num}")
+        
+        scaled_width, scaled_height, pad_x, pad_y = fit_to_canvas(seg_width, seg_height, max_width, max_height)
+        
+        print(f"INFO:Segment resolution: {seg_width}x{seg_height}")
+        if scaled_width != seg_width or scaled_height != seg_height:
+            print(f"INFO:Scaling to: {scaled_width}x{scaled_height} with padding: x={pad_x}, y={pad_y}")
+
+        # Process frames
+        for canvas in iter_output_frames(segments[segment_num], seg_width, seg_height, max_width, max_height):
+            out.write(canvas)
+            if not out.isOpened():
+                out.release()
+                return False
             
-            # Get segment resolution from first frame
-            first_frame = cv2.imread(os.path.join(frames_dir, segment_frames[0]))
-            if first_frame is None:
-                print(f"WARNING:Skipping segment {segment_num} - could not read first frame")
+            frames_written += 1
+            # Only report whole-percent changes, one stdout write per frame adds up
+            progress = min(100, frames_written * 100 // max(1, total_frames))
+            if progress != last_progress:
+                force_print(f"PROGRESS:{progress}")
+                last_progress = progress
+
+    out.release()
+    return not getattr(out, 'failed', False)
+
+def remux_video(input_path, output_path, ffmpeg_path):
+    """Copies the streams of a video into output_path's container without re-encoding"""
+    try:
+        result = subprocess.run(
+            [ffmpeg_path, '-y', '-loglevel', 'error', '-i', input_path, '-c', 'copy', output_path],
+            capture_output=True, text=True
+        )
+    except OSError as e:
+        print(f"WARNING:Could not remux {input_path}: {str(e)}")
+        return False
+    if result.returncode != 0:
+        print(f"WARNING:Could not remux {input_path}, re-encoding it: {' '.join(result.stderr.split())}")
+        return False
+    return True
+
+def create_video(frames_dir, output_path, fps):
+    """
+    Creates the final video from the recorded segments using OpenCV.
+    A single streamed mp4 segment already is the final video and is just moved into place,
+    an .avi one is remuxed;
+    multiple segments (or JPEG fallback frames) are re-encoded at a common resolution.
+    """
+    try:
+        manifest = load_manifest(frames_dir)
+        segments = collect_segments(frames_dir, manifest)
+        if not segments:
+            print("ERROR:No frames found for video creation")
+            return False
+        if manifest is not None and len(manifest) > 1:
+            capture_span = manifest['ts'][-1] - manifest['ts'][0]
+            print(f"INFO:Recording has {len(manifest)} frames captured over {capture_span:.0f} seconds")
+
+        ffmpeg_path = shutil.which('ffmpeg')
+
+        # Recording streamed straight into a single segment, nothing left to encode
+        if len(segments) == 1:
+            kind, source = next(iter(segments.values()))
+            if kind == 'video' and source.endswith('.mp4'):
+                os.replace(source, output_path)
+                print(f"\nINFO:Video created successfully at {output_path}")
+                return True
+            # An .avi segment from the OpenCV fallback only needs its streams moved into an mp4
+            if kind == 'video' and ffmpeg_path and remux_video(source, output_path, ffmpeg_path):
+                print("PROGRESS:100")
+                print(f"\nINFO:Video created successfully at {output_path}")
+                return True
+            # A single run of fallback frames has a common size, ffmpeg can take it as-is
+            if kind == 'frames' and ffmpeg_path and encode_frame_sequence(source, output_path, fps, ffmpeg_path):
+                print("PROGRESS:100")
+                print(f"\nINFO:Video created successfully at {output_path}")
+                return True
+            # Without ffmpeg, store the JPEGs as MJPEG packets rather than decoding and re-encoding them
+            if kind == 'frames' and av is not None and mux_jpeg_frames(source, output_path, fps):
+                print(f"\nINFO:Video created successfully at {output_path}")
+                return True
+
+        # Find maximum resolution across all segments
+        segment_infos = {}
+        max_width = 0
+        max_height = 0
+        for segment_num, segment in sorted(segments.items()):
+            info = read_segment_info(segment)
+            if info is None:
+                print(f"WARNING:Skipping segment {segment_num} - could not read it")
                 continue
+            segment_infos[segment_num] = info
+            max_width = max(max_width, info[0])
+            max_height = max(max_height, info[1])
 
-            seg_height, seg_width = first_frame.shape[:2]
-            
-            # Calculate scaling and padding
-            scale = min(max_width / seg_width, max_height / seg_height)
-            scaled_width = int(seg_width * scale)
-            scaled_height = int(seg_height * scale)
-            
-            # Calculate padding to center the frame
-            pad_x = (max_width - scaled_width) // 2
-            pad_y = (max_height - scaled_height) // 2
-            
-            print(f"INFO:Segment resolution: {seg_width}x{seg_height}")
-            if scaled_width != seg_width or scaled_height != seg_height:
-                print(f"INFO:Scaling to: {scaled_width}x{scaled_height} with padding: x={pad_x}, y={pad_y}")
+        if max_width == 0 or max_height == 0:
+            print("ERROR:Could not determine maximum resolution")
+            return False
 
-            # Process frames
-            for frame_file in segment_frames:
-                frame = cv2.imread(os.path.join(frames_dir, frame_file))
-                if frame is not None:
-                    # Scale frame if needed
-                    if scaled_width != seg_width or scaled_height != seg_height:
-                        frame = cv2.resize(frame, (scaled_width, scaled_height), interpolation=cv2.INTER_LANCZOS4)
-                    
-                    # Create black canvas of maximum size
-                    canvas = np.zeros((max_height, max_width, 3), dtype=np.uint8)
-                    
-                    # Place scaled frame in center
-                    canvas[pad_y:pad_y + scaled_height, pad_x:pad_x + scaled_width] = frame
-                    
-                    # Write frame
-                    out.write(canvas)
-                    
-                    frames_written += 1
-                    progress = int((frames_written / total_frames) * 100)
-                    print(f"PROGRESS:{progress}")
+        print(f"INFO:Maximum resolution across all segments: {max_width}x{max_height}")
+
+        # Encode chunks on all cores when ffmpeg is around to join them
+        backend, workers = parallel_encode_plan() if ffmpeg_path else (None, 1)
+        jobs = split_into_chunks(segments, segment_infos, workers) if workers > 1 else []
+        if len(jobs) > 1:
+            print(f"INFO:Encoding {len(jobs)} chunks in parallel with {backend[1]}")
+            if create_video_parallel(jobs, frames_dir, output_path, fps, max_width, max_height,
+                                     ffmpeg_path, backend, workers):
+                print(f"\nINFO:Video created successfully at {output_path}")
+                return True
+            print("WARNING:Parallel encoding failed, encoding sequentially")
 
-        out.release()
+        # Initialize video writer with maximum resolution, moving on to the next backend if it dies
+        backends = video_writer_backends()
+        while True:
+            out, final_path = open_video_writer(output_path, fps, max_width, max_height, backends=backends)
+            if out is None:
+                print("ERROR:Failed to create video writer")
+                return False
+            if write_segments(out, segments, segment_infos, max_width, max_height):
+                break
+            print("WARNING:Video writer failed, encoding again with the next encoder")
         
         # Verify the video was created
         if os.path.exists(final_path) and os.path.getsize(final_path) > 0:
@@ -608,7 +2146,6 @@ def create_video(frames_dir, output_path, fps):
 
     except Exception as e:
         print(f"ERROR:Failed to create video: {str(e)}")
-        import traceback
         print(f"DEBUG:Stack trace: {traceback.format_exc()}")
         return False
 
@@ -625,14 +2162,14 @@ def main():
     record_parser.add_argument('--temp-dir', required=True, help='Directory for temporary frame storage')
     record_parser.add_argument('--frame-interval', type=float, default=0.2, help='Interval between frames in seconds')
     record_parser.add_argument('--video-fps', type=int, default=10, help='FPS for output video')
-    record_parser.add_argument('--quality', type=int, default=95, help='JPEG quality for frames (1-100)')
+    record_parser.add_argument('--quality', type=int, default=85, help='JPEG quality for frames (1-100)')
     record_parser.add_argument('--capture-area', type=str, help='JSON string defining capture area')
     record_parser.add_argument('--multi-monitor', action='store_true', help='Capture all monitors')
     record_parser.add_argument('--record-only-ide', action='store_true', default=False, help='Record only VS Code window')
     
     # Create video mode parser
-    video_parser = subparsers.add_parser('create-video', help='Create video from frames')
-    video_parser.add_argument('--frames-dir', required=True, help='Directory containing frame images')
+    video_parser = subparsers.add_parser('create-video', help='Create video from recorded segments')
+    video_parser.add_argument('--frames-dir', required=True, help='Directory containing recorded segments and frame images')
     video_parser.add_argument('--output-path', required=True, help='Path for output video file')
     video_parser.add_argument('--fps', type=int, required=True, help='Frames per second for output video')
 